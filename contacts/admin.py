@@ -1,5 +1,36 @@
 from django.contrib import admin
-from .models import Contact, ContactStatus
+from .counters import city_counts, status_counts
+from .models import CityLocation, Contact, ContactStatus, ImportJob
+from .search import search_contacts
+from .statuses import all_statuses
+
+
+class StatusCountFilter(admin.SimpleListFilter):
+    title = "status"
+    parameter_name = "status__id__exact"
+
+    def lookups(self, request, model_admin):
+        counts = status_counts()
+        return [(str(status.pk), f"{status.name} ({counts.get(status.pk, 0)})") for status in all_statuses()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(status_id=self.value())
+        return queryset
+
+
+class CityCountFilter(admin.SimpleListFilter):
+    title = "city"
+    parameter_name = "city"
+
+    def lookups(self, request, model_admin):
+        return [(city, f"{city} ({count})") for city, count in city_counts()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(city=self.value())
+        return queryset
+
 
 @admin.register(ContactStatus)
 class ContactStatusAdmin(admin.ModelAdmin):
@@ -9,4 +40,21 @@ class ContactStatusAdmin(admin.ModelAdmin):
 class ContactAdmin(admin.ModelAdmin):
     list_display = ["first_name", "last_name", "phone_number", "email", "city", "status", "created_at"]
     search_fields = ["first_name", "last_name", "email", "phone_number", "city"]
-    list_filter = ["status", "city"]
+    # Both filters read the precomputed counters instead of grouping the contacts table.
+    list_filter = [StatusCountFilter, CityCountFilter]
+
+    def get_search_results(self, request, queryset, search_term):
+        return search_contacts(queryset, search_term), False
+
+
+@admin.register(CityLocation)
+class CityLocationAdmin(admin.ModelAdmin):
+    list_display = ["name", "lat", "lon", "lookup_status", "updated_at"]
+    search_fields = ["name"]
+    list_filter = ["lookup_status"]
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ["id", "original_name", "status", "rows_processed", "created_count", "skipped_count", "created_at"]
+    list_filter = ["status"]
@@ -1,7 +1,24 @@
+from django.conf import settings
 from django.urls import path
-from .api_views import ContactListCreateApiView, ContactDetailApiView
+from .api_views import (
+    ContactBulkApiView,
+    ContactListCreateApiView,
+    ContactDetailApiView,
+    ContactStatsApiView,
+    ImportJobDetailApiView,
+    WeatherApiView,
+    weather_api_async,
+)
 
 urlpatterns = [
     path("contacts/", ContactListCreateApiView.as_view(), name="api_contacts_list_create"),
+    path("contacts/bulk/", ContactBulkApiView.as_view(), name="api_contacts_bulk"),
+    path("contacts/stats/", ContactStatsApiView.as_view(), name="api_contacts_stats"),
     path("contacts/<int:pk>/", ContactDetailApiView.as_view(), name="api_contacts_detail"),
+    path("import-jobs/<int:pk>/", ImportJobDetailApiView.as_view(), name="api_import_jobs_detail"),
+    path(
+        "weather/",
+        weather_api_async if settings.CONTACTS_ASYNC_VIEWS else WeatherApiView.as_view(),
+        name="api_weather",
+    ),
 ]
\ No newline at end of file
@@ -1,11 +1,153 @@
+import hashlib
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.gzip import gzip_page
 from rest_framework import generics
-from .models import Contact
-from .serializers import ContactSerializer
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .bulk import BulkContactProcessor
+from .counters import city_counts, status_counts
+from .filters import ContactFilterBackend
+from .models import CityLocation, Contact, ImportJob, normalize_city_name
+from .pagination import ContactCursorPagination
+from .parsers import NDJSONParser
+from .serializers import ContactSerializer, ImportJobSerializer, contact_row_mapper
+from .services import (
+    aget_weather_for_cities,
+    auncached_weather_cities,
+    get_weather_for_cities,
+    uncached_weather_cities,
+)
+from .statuses import all_statuses
+from .versioning import data_version_modified_at, get_data_version
+
+WEATHER_MAX_AGE = 60 * 5
+ORDERING_COLUMNS = ["id", "created_at"]
 
+@method_decorator(gzip_page, name="dispatch")
 class ContactListCreateApiView(generics.ListCreateAPIView):
-    queryset = Contact.objects.select_related("status").all().order_by("id")
+    queryset = Contact.objects.defer("search_vector").order_by("id")
     serializer_class = ContactSerializer
+    pagination_class = ContactCursorPagination
+    filter_backends = [ContactFilterBackend, OrderingFilter]
+    ordering_fields = ["id", "created_at"]
+    ordering = ["id"]
+
+    def list(self, request, *args, **kwargs):
+        # The data version changes on every write, so it alone decides whether a cached page is still valid.
+        version = get_data_version()
+        payload = f"{version}:{request.get_full_path()}:{request.accepted_media_type}"
+        etag = quote_etag(hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32])
+        last_modified = int(data_version_modified_at(version).timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self._list_rows(request)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
+    def _list_rows(self, request):
+        # Reads skip model instances and the serializer field pipeline; writes still use ContactSerializer.
+        mapper = contact_row_mapper(request)
+        queryset = self.filter_queryset(self.get_queryset()).values(*mapper.columns, *ORDERING_COLUMNS)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response([mapper(row) for row in queryset])
+        return self.get_paginated_response([mapper(row) for row in page])
+
+class ContactStatsApiView(APIView):
+    def get(self, request):
+        counts = status_counts()
+        statuses = [
+            {"id": status.pk, "name": status.name, "count": counts.get(status.pk, 0)} for status in all_statuses()
+        ]
+        cities = [{"city": city, "count": count} for city, count in city_counts()]
+        return Response({"total": sum(counts.values()), "statuses": statuses, "cities": cities})
+
+@method_decorator(gzip_page, name="dispatch")
 class ContactDetailApiView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Contact.objects.select_related("status").all()
+    queryset = Contact.objects.all()
     serializer_class = ContactSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        mapper = contact_row_mapper(request)
+        queryset = self.filter_queryset(self.get_queryset()).values(*mapper.columns)
+        row = get_object_or_404(queryset, **{self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]})
+        return Response(mapper(row))
+
+class ContactBulkApiView(APIView):
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({"non_field_errors": ["Expected a JSON array or NDJSON of operations."]})
+        if len(items) > settings.CONTACTS_BULK_MAX_ITEMS:
+            raise ValidationError(
+                {"non_field_errors": [f"A bulk request accepts at most {settings.CONTACTS_BULK_MAX_ITEMS} items."]}
+            )
+        return Response(BulkContactProcessor().run(items))
+
+class ImportJobDetailApiView(generics.RetrieveAPIView):
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+
+
+def _weather_cities(request):
+    # One ?city= per city: city names are free text and may contain commas.
+    cities = list(dict.fromkeys(city.strip() for city in request.GET.getlist("city") if city.strip()))
+    if len(cities) > settings.CONTACTS_MAX_PAGE_SIZE:
+        raise ValidationError({"city": [f"At most {settings.CONTACTS_MAX_PAGE_SIZE} cities per request."]})
+    return cities
+
+
+def _city_locations(cities):
+    names = {normalize_city_name(city) for city in cities}
+    return CityLocation.objects.filter(name__in=names, lat__isnull=False, lon__isnull=False)
+
+
+def _coordinates_for(cities, locations):
+    coordinates_by_name = {location.name: location.coordinates for location in locations}
+    return {city: coordinates_by_name.get(normalize_city_name(city)) for city in cities}
+
+
+def _weather_response_data(weather, pending):
+    return {"results": weather, "pending": pending}
+
+
+def _cache_weather_response(response, pending):
+    # Cities still being fetched must be asked for again, so only complete answers are cacheable.
+    if pending:
+        patch_cache_control(response, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=WEATHER_MAX_AGE)
+    return response
+
+
+class WeatherApiView(APIView):
+    def get(self, request):
+        cities = _weather_cities(request)
+        coordinates = _coordinates_for(cities, _city_locations(cities))
+        weather = get_weather_for_cities(cities, coordinates=coordinates)
+        pending = uncached_weather_cities(cities)
+        return _cache_weather_response(Response(_weather_response_data(weather, pending)), pending)
+
+
+async def weather_api_async(request):
+    try:
+        cities = _weather_cities(request)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    locations = [location async for location in _city_locations(cities)]
+    weather = await aget_weather_for_cities(cities, coordinates=_coordinates_for(cities, locations))
+    pending = await auncached_weather_cities(cities)
+    return _cache_weather_response(JsonResponse(_weather_response_data(weather, pending)), pending)
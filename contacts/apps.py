@@ -5,7 +5,11 @@ class ContactsConfig(AppConfig):
     name = 'contacts'
 
     def ready(self):
-        from .models import ContactStatus
-        default_statuses = ["new", "in progress", "lost", "outdated"]
-        for status_name in default_statuses:
-            ContactStatus.objects.get_or_create(name=status_name)
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .db import configure_sqlite_connection
+        from .metrics import install_query_recorder
+
+        connection_created.connect(configure_sqlite_connection, dispatch_uid="contacts_configure_sqlite")
+        connection_created.connect(install_query_recorder, dispatch_uid="contacts_install_query_recorder")
@@ -0,0 +1,129 @@
+import csv
+import gc
+import io
+import statistics
+import time
+import tracemalloc
+from collections import Counter
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .counters import STATUS, apply_counter_deltas
+from .importers import ContactImporter
+from .models import Contact, ContactStatus
+from .seeding import generate_contact_rows, next_seed_number
+from .versioning import bump_data_version
+
+IMPORT_FIELDS = ["first_name", "last_name", "phone_number", "email", "city", "status"]
+
+
+class Scenario:
+    def __init__(self, name, run, setup=None, teardown=None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+        self.teardown = teardown or (lambda state: None)
+
+
+def _get(client, path):
+    def run(state=None):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+    return run
+
+
+def _cold_page_cache():
+    # A new data version means the page is rendered instead of served from the fragment cache.
+    bump_data_version()
+
+
+def _import_scenario(rows):
+    def setup():
+        last_id = Contact.objects.aggregate(last=Max("id"))["last"] or 0
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=IMPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(generate_contact_rows(rows, start=next_seed_number()))
+        return last_id, output.getvalue()
+
+    def run(state):
+        ContactImporter().run(csv.DictReader(io.StringIO(state[1])))
+
+    def teardown(state):
+        Contact.objects.filter(id__gt=state[0]).delete()
+
+    return Scenario("csv_import", run, setup, teardown)
+
+
+def _normalize_scenario(rows):
+    def setup():
+        new_status = ContactStatus.objects.get_or_create(name="new")[0]
+        polish_status = ContactStatus.objects.get_or_create(name="nowy")[0]
+        ids = list(Contact.objects.filter(status=new_status).order_by("id").values_list("id", flat=True)[:rows])
+        with transaction.atomic():
+            Contact.objects.filter(id__in=ids).update(status=polish_status)
+            apply_counter_deltas(
+                Counter({(STATUS, str(new_status.pk)): -len(ids), (STATUS, str(polish_status.pk)): len(ids)})
+            )
+            bump_data_version()
+
+    def run(state):
+        call_command("normalize_statuses", stdout=io.StringIO())
+
+    return Scenario("normalize_statuses", run, setup)
+
+
+def build_scenarios(import_rows=1000, normalize_rows=10000):
+    client = Client()
+    ids = Contact.objects.order_by("id").values_list("id", flat=True)
+    detail_id = ids[ids.count() // 2:].first()
+    scenarios = [
+        Scenario("list_last_name", _get(client, "/"), _cold_page_cache),
+        Scenario("list_created_at", _get(client, "/?sort=created_at"), _cold_page_cache),
+        Scenario("list_search", _get(client, "/?q=kowal"), _cold_page_cache),
+        Scenario("list_cached", _get(client, "/")),
+        Scenario("api_list", _get(client, "/api/contacts/?page_size=100")),
+    ]
+    # An empty table has no contact to fetch.
+    if detail_id is not None:
+        scenarios.append(Scenario("api_detail", _get(client, f"/api/contacts/{detail_id}/")))
+    return scenarios + [_import_scenario(import_rows), _normalize_scenario(normalize_rows)]
+
+
+def measure(scenario, repeat=5):
+    # Timed runs go without tracing; one extra run records queries and peak memory.
+    state = scenario.setup()
+    scenario.run(state)
+    scenario.teardown(state)
+    timings = []
+    for _ in range(repeat):
+        state = scenario.setup()
+        gc.collect()
+        started_at = time.perf_counter()
+        scenario.run(state)
+        timings.append(time.perf_counter() - started_at)
+        scenario.teardown(state)
+
+    state = scenario.setup()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            scenario.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        scenario.teardown(state)
+
+    return {
+        "scenario": scenario.name,
+        "runs": repeat,
+        "wall_ms_median": round(statistics.median(timings) * 1000, 2),
+        "wall_ms_min": round(min(timings) * 1000, 2),
+        "queries": len(queries),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
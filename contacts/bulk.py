@@ -0,0 +1,202 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from .counters import apply_counter_deltas, count_contacts, counter_keys, stored_counter_keys
+from .models import CityLocation, Contact, normalize_city_name
+from .serializers import ContactSerializer
+from .signals import bulk_contact_delete
+from .versioning import bump_data_version
+
+OPERATIONS = ("create", "upsert", "delete")
+CONTACT_FIELDS = ["first_name", "last_name", "phone_number", "email", "city", "status"]
+
+
+def _chunks(values, size):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class BulkContactProcessor:
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.CONTACTS_BULK_BATCH_SIZE
+        self.results = []
+        self.by_email = {}
+        self.by_phone_number = {}
+        # Contact id -> index of the delete item that removes it.
+        self.deleted_by = {}
+        self.counter_deltas = Counter()
+
+    def run(self, items):
+        self.results = [{"index": index} for index in range(len(items))]
+        writes = []
+        deletes = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or item.get("op") not in OPERATIONS:
+                self._fail(index, {"op": f"Expected one of: {', '.join(OPERATIONS)}."})
+                continue
+            self.results[index]["op"] = item["op"]
+            payload = {key: value for key, value in item.items() if key != "op"}
+            (deletes if item["op"] == "delete" else writes).append((index, item["op"], payload))
+
+        with transaction.atomic():
+            validated = self._validate(writes)
+            self._load_existing(validated)
+            self._resolve_deletes(deletes)
+            # Deletes run first so that a later item can reuse the email or phone number they free up.
+            self._apply_deletes()
+            self._apply_writes(validated)
+            bump_data_version()
+
+        summary = {"created": 0, "updated": 0, "deleted": 0, "not_found": 0, "error": 0}
+        for result in self.results:
+            summary[result["status"]] += 1
+        return {**summary, "results": self.results}
+
+    def _fail(self, index, errors):
+        self.results[index].update({"status": "error", "errors": errors})
+
+    def _validate(self, writes):
+        validators = {
+            "create": ContactSerializer(many=True).child,
+            "upsert": ContactSerializer(many=True, partial=True).child,
+        }
+        validated = []
+        for index, op, payload in writes:
+            try:
+                data = validators[op].run_validation(payload)
+            except serializers.ValidationError as exc:
+                self._fail(index, exc.detail)
+                continue
+            if op == "upsert" and not (data.get("email") or data.get("phone_number")):
+                self._fail(index, {"non_field_errors": ["Upserts need an email or phone_number to match on."]})
+                continue
+            validated.append((index, op, data))
+        return validated
+
+    def _load_existing(self, validated):
+        emails = {data["email"] for _, _, data in validated if data.get("email")}
+        phone_numbers = {data["phone_number"] for _, _, data in validated if data.get("phone_number")}
+        for chunk in _chunks(emails, self.batch_size):
+            for contact in Contact.objects.filter(email__in=chunk).defer("search_vector"):
+                self.by_email[contact.email] = contact
+        for chunk in _chunks(phone_numbers, self.batch_size):
+            for contact in Contact.objects.filter(phone_number__in=chunk).defer("search_vector"):
+                self.by_phone_number[contact.phone_number] = contact
+
+    def _existing(self, lookup, value, index):
+        # A contact deleted by an earlier item no longer exists for the items after it.
+        contact = lookup.get(value)
+        if contact is not None and self.deleted_by.get(contact.pk, index) < index:
+            return None
+        return contact
+
+    def _conflict(self, index, data, contact=None):
+        for field, lookup in (("email", self.by_email), ("phone_number", self.by_phone_number)):
+            owner = self._existing(lookup, data.get(field), index)
+            if owner is not None and owner is not contact:
+                return {field: [f"A contact with this {field} already exists."]}
+        return None
+
+    def _apply_writes(self, validated):
+        to_create = []
+        to_update = {}
+        for index, op, data in validated:
+            existing = None
+            if op == "upsert":
+                existing = (
+                    self._existing(self.by_email, data.get("email"), index)
+                    or self._existing(self.by_phone_number, data.get("phone_number"), index)
+                )
+            conflict = self._conflict(index, data, existing)
+            if conflict:
+                self._fail(index, conflict)
+                continue
+
+            if existing is None:
+                missing = [field for field in CONTACT_FIELDS if not data.get(field)]
+                if missing:
+                    self._fail(index, {field: ["This field is required when creating a contact."] for field in missing})
+                    continue
+                contact = Contact(**data)
+                to_create.append((index, contact))
+                self.results[index]["status"] = "created"
+            else:
+                contact = existing
+                for field, value in data.items():
+                    setattr(contact, field, value)
+                to_update[contact.pk] = contact
+                self.results[index].update({"status": "updated", "id": contact.pk})
+
+            # Later items in the same request see this contact as taken.
+            self.by_email[contact.email] = contact
+            self.by_phone_number[contact.phone_number] = contact
+
+        # An update to a contact that a later item deletes has nothing left to write.
+        to_update = {pk: contact for pk, contact in to_update.items() if pk not in self.deleted_by}
+        contacts = [contact for _, contact in to_create] + list(to_update.values())
+        location_ids = {}
+        for chunk in _chunks({normalize_city_name(contact.city) for contact in contacts}, self.batch_size):
+            location_ids.update(CityLocation.objects.filter(name__in=chunk).values_list("name", "id"))
+        for contact in contacts:
+            contact.location_id = location_ids.get(normalize_city_name(contact.city))
+            contact.update_search_vector()
+
+        Contact.objects.bulk_create([contact for _, contact in to_create], batch_size=self.batch_size)
+        for index, contact in to_create:
+            self.results[index]["id"] = contact.pk
+        Contact.objects.bulk_update(
+            list(to_update.values()),
+            CONTACT_FIELDS + ["location", "search_vector"],
+            batch_size=self.batch_size,
+        )
+        # Bulk writes skip model signals, so counters are adjusted here, together with the deletes.
+        for contact in to_update.values():
+            self.counter_deltas.subtract(stored_counter_keys(contact))
+        self.counter_deltas.update(count_contacts(contact for _, contact in to_create))
+        self.counter_deltas.update(count_contacts(to_update.values()))
+        apply_counter_deltas(self.counter_deltas)
+
+    def _apply_deletes(self):
+        for chunk in _chunks(self.deleted_by, self.batch_size):
+            contacts = Contact.objects.filter(id__in=chunk)
+            for status_id, city in contacts.values_list("status_id", "city"):
+                self.counter_deltas.subtract(counter_keys(status_id, city))
+            with bulk_contact_delete():
+                contacts.delete()
+
+    def _resolve_deletes(self, deletes):
+        keys = {"id": set(), "email": set(), "phone_number": set()}
+        for index, _, payload in deletes:
+            key = next((field for field in keys if payload.get(field) not in (None, "")), None)
+            if key is None:
+                self._fail(index, {"non_field_errors": ["Deletes need an id, email or phone_number."]})
+                continue
+            if key == "id":
+                try:
+                    payload["id"] = int(payload["id"])
+                except (TypeError, ValueError):
+                    self._fail(index, {"id": ["A valid integer is required."]})
+                    continue
+            keys[key].add(payload[key])
+
+        found = {field: {} for field in keys}
+        for field, values in keys.items():
+            for chunk in _chunks(values, self.batch_size):
+                rows = Contact.objects.filter(**{f"{field}__in": chunk}).values_list(field, "id")
+                found[field].update(rows)
+
+        for index, _, payload in deletes:
+            if self.results[index].get("status") == "error":
+                continue
+            key = next(field for field in keys if payload.get(field) not in (None, ""))
+            contact_id = found[key].get(payload[key])
+            # Deletes match contacts as they were before the request, each one once.
+            if contact_id is None or contact_id in self.deleted_by:
+                self.results[index]["status"] = "not_found"
+            else:
+                self.deleted_by[contact_id] = index
+                self.results[index].update({"status": "deleted", "id": contact_id})
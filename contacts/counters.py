@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+
+from .models import Contact, ContactCounter
+
+STATUS = ContactCounter.Kind.STATUS
+CITY = ContactCounter.Kind.CITY
+
+
+def counter_keys(status_id, city):
+    return [(STATUS, str(status_id)), (CITY, city)]
+
+
+def contact_counter_keys(contact):
+    return counter_keys(contact.status_id, contact.city)
+
+
+def stored_counter_keys(contact):
+    loaded = getattr(contact, "_loaded_values", {})
+    if "status_id" in loaded and "city" in loaded:
+        return counter_keys(loaded["status_id"], loaded["city"])
+    row = Contact.objects.filter(pk=contact.pk).values_list("status_id", "city").first()
+    return counter_keys(*row) if row else []
+
+
+def remember_counter_keys(contact):
+    contact._loaded_values = {
+        **getattr(contact, "_loaded_values", {}),
+        "status_id": contact.status_id,
+        "city": contact.city,
+    }
+
+
+def count_contacts(contacts):
+    deltas = Counter()
+    for contact in contacts:
+        deltas.update(contact_counter_keys(contact))
+    return deltas
+
+
+def apply_counter_deltas(deltas, using=None, batch_size=500):
+    # Two queries per batch however many statuses and cities are touched.
+    counters = ContactCounter.objects.using(using)
+    changed = sorted((kind, key, delta) for (kind, key), delta in deltas.items() if delta)
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        counters.bulk_create(
+            [ContactCounter(kind=kind, key=key, count=0) for kind, key, _ in batch], ignore_conflicts=True
+        )
+        whens = [When(kind=kind, key=key, then=Value(delta)) for kind, key, delta in batch]
+        keys_by_kind = {}
+        for kind, key, _ in batch:
+            keys_by_kind.setdefault(kind, []).append(key)
+        matching = Q()
+        for kind, keys in keys_by_kind.items():
+            matching |= Q(kind=kind, key__in=keys)
+        counters.filter(matching).update(count=F("count") + Case(*whens, default=Value(0)))
+
+
+def rebuild_counters(using=None):
+    contacts = Contact.objects.using(using).order_by()
+    rows = [
+        ContactCounter(kind=STATUS, key=str(status_id), count=count)
+        for status_id, count in contacts.values_list("status_id").annotate(count=Count("id"))
+    ]
+    rows += [
+        ContactCounter(kind=CITY, key=city, count=count)
+        for city, count in contacts.values_list("city").annotate(count=Count("id"))
+    ]
+    with transaction.atomic(using=using):
+        ContactCounter.objects.using(using).all().delete()
+        ContactCounter.objects.using(using).bulk_create(rows)
+    return len(rows)
+
+
+def status_counts():
+    rows = ContactCounter.objects.filter(kind=STATUS, count__gt=0).values_list("key", "count")
+    return {int(key): count for key, count in rows}
+
+
+def city_counts():
+    return list(ContactCounter.objects.filter(kind=CITY, count__gt=0).order_by("key").values_list("key", "count"))
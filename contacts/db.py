@@ -0,0 +1,9 @@
+from django.conf import settings
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    # Pragmas go through the raw connection, so they are not counted as request queries.
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,44 @@
+import csv
+import json
+
+from django.conf import settings
+
+from .models import Contact
+
+EXPORT_HEADER = ["first_name", "last_name", "phone_number", "email", "city", "status"]
+EXPORT_COLUMNS = ["first_name", "last_name", "phone_number", "email", "city", "status__name"]
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class _LineBuffer:
+    def write(self, value):
+        return value
+
+
+def iter_contact_rows(queryset=None, chunk_size=None):
+    if queryset is None:
+        queryset = Contact.objects.all()
+    rows = queryset.order_by("id").values_list(*EXPORT_COLUMNS)
+    return rows.iterator(chunk_size=chunk_size or settings.CONTACTS_EXPORT_CHUNK_SIZE)
+
+
+def iter_csv(rows):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_HEADER, row)), ensure_ascii=False) + "\n"
+
+
+def export_contacts(export_format, queryset=None, chunk_size=None):
+    rows = iter_contact_rows(queryset, chunk_size)
+    if export_format == "ndjson":
+        return iter_ndjson(rows)
+    return iter_csv(rows)
@@ -0,0 +1,46 @@
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def _parse_boundary(value, param, end_of_day=False):
+    try:
+        date_value = parse_date(value)
+        parsed = parse_datetime(value) if date_value is None else None
+    except ValueError:
+        date_value = parsed = None
+    if date_value is not None:
+        parsed = datetime.datetime.combine(date_value, datetime.time.max if end_of_day else datetime.time.min)
+    if parsed is None:
+        raise ValidationError({param: "Enter a valid ISO 8601 date or datetime."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class ContactFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        status_names = [name.strip() for name in params.get("status", "").split(",") if name.strip()]
+        if status_names:
+            queryset = queryset.filter(status__name__in=status_names)
+
+        city = params.get("city", "").strip()
+        if city:
+            queryset = queryset.filter(city=city)
+
+        created_after = params.get("created_after", "").strip()
+        if created_after:
+            queryset = queryset.filter(created_at__gte=_parse_boundary(created_after, "created_after"))
+
+        created_before = params.get("created_before", "").strip()
+        if created_before:
+            queryset = queryset.filter(
+                created_at__lte=_parse_boundary(created_before, "created_before", end_of_day=True)
+            )
+
+        return queryset
@@ -1,10 +1,45 @@
 from django import forms
-from .models import Contact
+from django.conf import settings
+from django.forms.models import ModelChoiceIterator
+from django.template.defaultfilters import filesizeformat
+from .models import Contact, ContactStatus
+from .statuses import all_statuses, get_status_by_id
 
 COUNTRY_CODES = [
     ("+48", "🇵🇱 +48"),
 ]
 
+class StatusChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for status in all_statuses():
+            yield self.choice(status)
+
+    def __len__(self):
+        return len(all_statuses()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(all_statuses())
+
+
+class StatusChoiceField(forms.ModelChoiceField):
+    iterator = StatusChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, ContactStatus):
+            return value
+        try:
+            status = get_status_by_id(int(str(value)))
+        except ValueError:
+            status = None
+        if status is None:
+            raise forms.ValidationError(self.error_messages["invalid_choice"], code="invalid_choice")
+        return status
+
+
 class ContactForm(forms.ModelForm):
     country_code = forms.CharField(
         required=False,
@@ -15,6 +50,7 @@ class ContactForm(forms.ModelForm):
     class Meta:
         model = Contact
         fields = ["first_name", "last_name", "phone_number", "email", "city", "status"]
+        field_classes = {"status": StatusChoiceField}
         widgets = {
             "first_name": forms.TextInput(attrs={"class": "form-control", "required": True}),
             "last_name": forms.TextInput(attrs={"class": "form-control", "required": True}),
@@ -26,11 +62,6 @@ class ContactForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        from .models import ContactStatus
-        default_statuses = ["new", "in progress", "lost", "outdated"]
-        for status_name in default_statuses:
-            ContactStatus.objects.get_or_create(name=status_name)
-        
         if self.instance and self.instance.pk:
             phone_value = self.instance.phone_number
             if phone_value and phone_value.startswith("+48"):
@@ -55,3 +86,10 @@ class ContactForm(forms.ModelForm):
 
 class CsvImportForm(forms.Form):
     file = forms.FileField(widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv"}))
+
+    def clean_file(self):
+        uploaded_file = self.cleaned_data["file"]
+        max_size = settings.CONTACTS_IMPORT_MAX_UPLOAD_SIZE
+        if max_size and uploaded_file.size > max_size:
+            raise forms.ValidationError(f"The file is too large. The limit is {filesizeformat(max_size)}.")
+        return uploaded_file
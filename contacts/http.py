@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import record_upstream
+
+USER_AGENT = "contacts-django-app/1.0"
+
+
+class UpstreamClient:
+    """A keep-alive session for one upstream host, shared by all threads of the process."""
+
+    def __init__(self, name: str, url_setting: str):
+        self.name = name
+        self.url_setting = url_setting
+        self._session = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_wait = 0.0
+
+    @property
+    def url(self):
+        return getattr(settings, self.url_setting)
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                max_connections = settings.UPSTREAM_MAX_CONNECTIONS
+                retry = Retry(
+                    total=settings.UPSTREAM_RETRIES,
+                    backoff_factor=settings.UPSTREAM_RETRY_BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["GET"]),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, max_retries=retry)
+                session = requests.Session()
+                session.headers["User-Agent"] = USER_AGENT
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._semaphore = threading.BoundedSemaphore(max_connections)
+                self._session = session
+            return self._session, self._semaphore
+
+    @contextmanager
+    def _track(self, queued_at):
+        started_at = time.monotonic()
+        failed = False
+        with self._lock:
+            self.in_flight += 1
+            self.total_wait += started_at - queued_at
+        try:
+            yield
+        except Exception:
+            failed = True
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            latency = time.monotonic() - started_at
+            with self._lock:
+                self.in_flight -= 1
+                self.requests += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+            record_upstream(self.name, latency, failed)
+
+    def get(self, params=None, timeout=10):
+        session, semaphore = self._get_session()
+        queued_at = time.monotonic()
+        with semaphore, self._track(queued_at):
+            response = session.get(self.url, params=params, timeout=timeout)
+            response.raise_for_status()
+        return response
+
+    async def aget(self, params=None, timeout=10):
+        # The pooled session does the work on a worker thread, so async callers get the same
+        # connection limit, retries and backoff as sync ones.
+        return await asyncio.to_thread(self.get, params=params, timeout=timeout)
+
+    def _connections_opened(self):
+        session = self._session
+        if session is None:
+            return 0
+        pools = session.get_adapter(self.url).poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self):
+        with self._lock:
+            requests_count = self.requests
+            return {
+                "name": self.name,
+                "url": self.url,
+                "requests": requests_count,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "max_connections": settings.UPSTREAM_MAX_CONNECTIONS,
+                "connections_opened": self._connections_opened(),
+                "avg_latency_ms": round(self.total_latency / requests_count * 1000, 2) if requests_count else None,
+                "max_latency_ms": round(self.max_latency * 1000, 2),
+                "total_wait_ms": round(self.total_wait * 1000, 2),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._semaphore = None
+            self._reset_metrics()
+
+
+nominatim_client = UpstreamClient("nominatim", "NOMINATIM_URL")
+open_meteo_client = UpstreamClient("open-meteo", "OPEN_METEO_URL")
+
+
+def upstream_clients():
+    return [nominatim_client, open_meteo_client]
@@ -0,0 +1,167 @@
+import codecs
+import csv
+from contextlib import nullcontext
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .counters import apply_counter_deltas, count_contacts
+from .models import CityLocation, Contact, normalize_city_name
+from .statuses import canonical_status_name, get_default_status, get_or_create_status
+from .versioning import bump_data_version
+
+REQUIRED_FIELDS = ["first_name", "last_name", "phone_number", "email", "city"]
+MAX_LINE_LENGTH = 64 * 1024
+MAX_STORED_ERRORS = 100
+
+
+def _check_line_length(length, max_line_length):
+    if length > max_line_length:
+        raise csv.Error(f"A line in the file is longer than {max_line_length} characters.")
+
+
+def iter_decoded_lines(chunks, encoding="utf-8-sig", max_line_length=MAX_LINE_LENGTH):
+    # The utf-8-sig decoder drops a leading BOM and otherwise behaves like utf-8.
+    decoder = codecs.getincrementaldecoder(encoding)()
+    # Only newly decoded text is split, and the unfinished line is kept in pieces, so a long line
+    # costs linear time and at most max_line_length characters of memory.
+    pending = []
+    pending_length = 0
+    for chunk in chunks:
+        *lines, tail = decoder.decode(chunk).split("\n")
+        if lines:
+            lines[0] = "".join(pending) + lines[0]
+            pending, pending_length = [], 0
+            for line in lines:
+                _check_line_length(len(line), max_line_length)
+                yield line + "\n"
+        if tail:
+            pending.append(tail)
+            pending_length += len(tail)
+            _check_line_length(pending_length, max_line_length)
+    pending.append(decoder.decode(b"", final=True))
+    line = "".join(pending)
+    if line:
+        _check_line_length(len(line), max_line_length)
+        yield line
+
+
+def read_csv_rows(uploaded_file):
+    return csv.DictReader(iter_decoded_lines(uploaded_file.chunks()))
+
+
+class ImportResult:
+    def __init__(self):
+        self.created_count = 0
+        self.skipped_count = 0
+        self.rows_processed = 0
+        # The first MAX_STORED_ERRORS skipped rows by row number; the rest are only counted.
+        self.errors = []
+
+    def skip(self, row_number, reason):
+        self.skipped_count += 1
+        self.errors.append((row_number, reason))
+        if len(self.errors) > MAX_STORED_ERRORS:
+            self.errors.sort()
+            del self.errors[MAX_STORED_ERRORS:]
+
+
+class ContactImporter:
+    def __init__(self, batch_size=None, progress=None, atomic=True):
+        self.batch_size = batch_size or settings.CONTACTS_IMPORT_BATCH_SIZE
+        self.progress = progress
+        self.atomic = atomic
+        self.result = ImportResult()
+        self.default_status = None
+        self.statuses = {}
+        self.seen_phone_numbers = set()
+        self.seen_emails = set()
+
+    def run(self, rows):
+        # With atomic=False every batch commits on its own, so progress is visible to other connections.
+        with transaction.atomic() if self.atomic else nullcontext():
+            self.default_status = get_default_status()
+            numbered_rows = enumerate(rows, start=2)
+            while True:
+                batch = list(islice(numbered_rows, self.batch_size))
+                if not batch:
+                    break
+                with nullcontext() if self.atomic else transaction.atomic():
+                    self._import_batch(batch)
+                if self.progress:
+                    self.progress(self.result)
+        self.result.errors.sort()
+        return self.result
+
+    def _parse_row(self, row_number, row):
+        values = {field: (row.get(field) or "").strip() for field in REQUIRED_FIELDS}
+        if not all(values.values()):
+            self.result.skip(row_number, "missing required fields")
+            return None
+
+        if values["phone_number"] in self.seen_phone_numbers:
+            self.result.skip(row_number, "duplicate phone_number in file")
+            return None
+        if values["email"] in self.seen_emails:
+            self.result.skip(row_number, "duplicate email in file")
+            return None
+        self.seen_phone_numbers.add(values["phone_number"])
+        self.seen_emails.add(values["email"])
+
+        values["status"] = canonical_status_name(row.get("status"))
+        return values
+
+    def _status(self, name):
+        # Resolved once per run, so rows with a new status name do not each go back to the registry.
+        if name not in self.statuses:
+            self.statuses[name] = get_or_create_status(name)
+        return self.statuses[name]
+
+    def _import_batch(self, batch):
+        self.result.rows_processed += len(batch)
+        # Rows from earlier batches are already in the database, where the existence check below finds
+        # them, so only duplicates within this batch need remembering.
+        self.seen_phone_numbers.clear()
+        self.seen_emails.clear()
+        candidates = []
+        for row_number, row in batch:
+            values = self._parse_row(row_number, row)
+            if values is not None:
+                candidates.append((row_number, values))
+        if not candidates:
+            return
+
+        phone_numbers = [values["phone_number"] for _, values in candidates]
+        emails = [values["email"] for _, values in candidates]
+        existing_phone_numbers = set(
+            Contact.objects.filter(phone_number__in=phone_numbers).values_list("phone_number", flat=True)
+        )
+        existing_emails = set(Contact.objects.filter(email__in=emails).values_list("email", flat=True))
+
+        location_ids = dict(
+            CityLocation.objects.filter(
+                name__in={normalize_city_name(values["city"]) for _, values in candidates}
+            ).values_list("name", "id")
+        )
+
+        contacts = []
+        for row_number, values in candidates:
+            if values["phone_number"] in existing_phone_numbers:
+                self.result.skip(row_number, "phone_number already exists")
+                continue
+            if values["email"] in existing_emails:
+                self.result.skip(row_number, "email already exists")
+                continue
+            status_name = values.pop("status")
+            values["status"] = self._status(status_name) if status_name else self.default_status
+            values["location_id"] = location_ids.get(normalize_city_name(values["city"]))
+            contact = Contact(**values)
+            contact.update_search_vector()
+            contacts.append(contact)
+
+        Contact.objects.bulk_create(contacts, batch_size=self.batch_size)
+        self.result.created_count += len(contacts)
+        if contacts:
+            apply_counter_deltas(count_contacts(contacts))
+            bump_data_version()
@@ -0,0 +1,127 @@
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .importers import ContactImporter, read_csv_rows
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CONTACTS_IMPORT_JOB_WORKERS,
+                thread_name_prefix="import-job",
+            )
+        return _executor
+
+
+def _run_import_job_in_thread(job_id):
+    try:
+        run_import_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def enqueue_import_job(job):
+    backend = settings.CONTACTS_IMPORT_JOB_BACKEND
+    if backend == "sync":
+        run_import_job(job.pk)
+    elif backend == "thread":
+        transaction.on_commit(lambda: _get_executor().submit(_run_import_job_in_thread, job.pk))
+    # The "queue" backend leaves the job pending for the process_import_jobs command.
+
+
+def _start_job(queryset):
+    now = timezone.now()
+    return queryset.filter(status=ImportJob.Status.PENDING).update(
+        status=ImportJob.Status.RUNNING,
+        started_at=now,
+        heartbeat_at=now,
+        attempts=F("attempts") + 1,
+    )
+
+
+def requeue_stale_import_jobs():
+    """Puts jobs whose worker stopped reporting progress back in the queue, or fails them after too many tries."""
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.CONTACTS_IMPORT_JOB_STALE_AFTER)
+    stale = ImportJob.objects.filter(status=ImportJob.Status.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    requeued = stale.filter(attempts__lt=settings.CONTACTS_IMPORT_JOB_MAX_ATTEMPTS).update(
+        status=ImportJob.Status.PENDING
+    )
+    # Whatever is still RUNNING after the requeue has used up its attempts.
+    for job in stale:
+        logger.warning("Import job %s stopped responding %s times, giving up", job.pk, job.attempts)
+        job.file.delete(save=False)
+        job.status = ImportJob.Status.FAILED
+        job.error_message = "The import worker stopped responding."
+        job.finished_at = timezone.now()
+        job.save()
+    return requeued
+
+
+def claim_next_import_job():
+    requeue_stale_import_jobs()
+    with transaction.atomic():
+        job = ImportJob.objects.filter(status=ImportJob.Status.PENDING).order_by("created_at").first()
+        if job is None:
+            return None
+        claimed = _start_job(ImportJob.objects.filter(pk=job.pk))
+    return job if claimed else claim_next_import_job()
+
+
+def run_import_job(job_id):
+    _start_job(ImportJob.objects.filter(pk=job_id))
+    job = ImportJob.objects.get(pk=job_id)
+
+    def report_progress(result):
+        ImportJob.objects.filter(pk=job_id).update(
+            rows_processed=result.rows_processed,
+            created_count=result.created_count,
+            skipped_count=result.skipped_count,
+            heartbeat_at=timezone.now(),
+        )
+
+    importer = ContactImporter(progress=report_progress, atomic=False)
+    status, error_message = ImportJob.Status.COMPLETED, ""
+    try:
+        with job.file.open("rb") as uploaded_file:
+            importer.run(read_csv_rows(uploaded_file))
+    except UnicodeDecodeError:
+        status, error_message = ImportJob.Status.FAILED, "The file must be UTF-8 encoded."
+    except Exception as exc:
+        logger.exception("Import job %s failed", job_id)
+        status, error_message = ImportJob.Status.FAILED, str(exc) or exc.__class__.__name__
+    finally:
+        # Failed jobs are not retried with the same file, so it is removed either way.
+        job.file.delete(save=False)
+    _finish_job(job, importer.result, status, error_message)
+    return job
+
+
+def _finish_job(job, result, status, error_message=""):
+    job.status = status
+    job.error_message = error_message
+    job.rows_processed = result.rows_processed
+    job.created_count = result.created_count
+    job.skipped_count = result.skipped_count
+    job.errors = [
+        {"row": row_number, "reason": reason}
+        for row_number, reason in sorted(result.errors)
+    ]
+    job.finished_at = timezone.now()
+    job.save()
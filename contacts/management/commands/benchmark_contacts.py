@@ -0,0 +1,157 @@
+import datetime
+import json
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from contacts.benchmarks import build_scenarios, measure
+from contacts.models import Contact
+from contacts.seeding import seed_contacts
+from contacts.statuses import clear_status_cache
+
+
+def _benchmark_database_name(settings_dict):
+    name = str(settings_dict["NAME"])
+    if connection.vendor == "sqlite":
+        path = Path(name)
+        return str(path.with_name(f"benchmark_{path.name}"))
+    return f"benchmark_{name}"
+
+
+@contextmanager
+def _benchmark_database(keep):
+    """Points the default connection at a separate database created with the test runner's machinery."""
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    configured_test_name = test_settings.get("NAME")
+    old_name = connection.settings_dict["NAME"]
+    test_settings["NAME"] = _benchmark_database_name(connection.settings_dict)
+    try:
+        name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keep)
+        # Statuses cached from the configured database have the wrong primary keys here.
+        clear_status_cache()
+        try:
+            yield name
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keep)
+            clear_status_cache()
+    finally:
+        test_settings["NAME"] = configured_test_name
+
+
+def _current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Measures the contact list, API, CSV import and normalize_statuses at growing table sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated contact counts.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario.")
+        parser.add_argument("--scenarios", default="", help="Comma-separated scenario names (default: all).")
+        parser.add_argument("--import-rows", type=int, default=1000, help="Rows in the CSV import scenario.")
+        parser.add_argument("--normalize-rows", type=int, default=10000, help="Contacts moved to a Polish status.")
+        parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+        parser.add_argument("--compare", help="A previous results file to print relative changes against.")
+        parser.add_argument(
+            "--keep-database",
+            action="store_true",
+            help="Keep the benchmark database, and its seeded contacts, for the next run.",
+        )
+        parser.add_argument(
+            "--in-place",
+            action="store_true",
+            help="Benchmark the configured database itself. Seeded contacts and status changes stay there.",
+        )
+        parser.add_argument(
+            "--noinput", "--no-input", action="store_false", dest="interactive",
+            help="Do not ask for confirmation before running --in-place.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options["sizes"].split(",") if size.strip())
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of integers.")
+        if any(size < 0 for size in sizes):
+            raise CommandError("--sizes must not be negative.")
+        selected = {name.strip() for name in options["scenarios"].split(",") if name.strip()}
+
+        if not options["in_place"]:
+            with _benchmark_database(options["keep_database"]) as name:
+                self.stderr.write(f"Benchmarking a separate database: {name}")
+                results = self._run(sizes, selected, options)
+        else:
+            if options["interactive"]:
+                answer = input(
+                    f"This seeds up to {max(sizes, default=0)} contacts into {connection.settings_dict['NAME']} "
+                    "and rewrites their statuses. Type 'yes' to continue: "
+                )
+                if answer != "yes":
+                    raise CommandError("Benchmark cancelled.")
+            results = self._run(sizes, selected, options)
+
+        report = {
+            "commit": _current_commit(),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "database": connection.vendor,
+            "results": results,
+        }
+        if options["compare"]:
+            self._compare(report, options["compare"])
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output_file:
+                output_file.write(output + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} result(s) to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _run(self, sizes, selected, options):
+        results = []
+        # The benchmark drives the views through the test client, which uses the "testserver" host.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for size in sizes:
+                existing = Contact.objects.count()
+                if existing < size:
+                    self.stderr.write(f"Seeding {size - existing} contact(s)...")
+                    seed_contacts(size - existing)
+                elif existing > size:
+                    self.stderr.write(self.style.WARNING(f"Table already holds {existing} contacts, not {size}."))
+                rows = Contact.objects.count()
+
+                scenarios = build_scenarios(options["import_rows"], options["normalize_rows"])
+                for scenario in scenarios:
+                    if selected and scenario.name not in selected:
+                        continue
+                    result = {"rows": rows, **measure(scenario, options["repeat"])}
+                    results.append(result)
+                    self.stderr.write(
+                        f"{rows:>9} {result['scenario']:<20} {result['wall_ms_median']:>10.2f} ms "
+                        f"{result['queries']:>5} queries {result['peak_memory_kb']:>10.1f} KiB"
+                    )
+        return results
+
+    def _compare(self, report, path):
+        with open(path, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        previous = {(result["scenario"], result["rows"]): result for result in baseline.get("results", [])}
+        for result in report["results"]:
+            before = previous.get((result["scenario"], result["rows"]))
+            if before is None or not before["wall_ms_median"]:
+                continue
+            change = (result["wall_ms_median"] / before["wall_ms_median"] - 1) * 100
+            self.stderr.write(
+                f"{result['rows']:>9} {result['scenario']:<20} {change:>+7.1f}% time, "
+                f"{result['queries'] - before['queries']:+d} queries vs {baseline.get('commit') or path}"
+            )
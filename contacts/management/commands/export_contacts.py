@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from contacts.exporters import EXPORT_FORMATS, export_contacts
+
+
+class Command(BaseCommand):
+    help = "Streams all contacts as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write to (default: stdout).")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Rows fetched from the database at a time.")
+
+    def handle(self, *args, **options):
+        chunks = export_contacts(options["format"], chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
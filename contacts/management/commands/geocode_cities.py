@@ -0,0 +1,71 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from contacts.models import CityLocation, Contact, normalize_city_name
+from contacts.services import geocode_city
+
+
+class Command(BaseCommand):
+    help = "Geocodes every distinct contact city into the CityLocation table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Cities geocoded between progress reports.")
+        parser.add_argument("--delay", type=float, default=1.0, help="Seconds to wait between Nominatim requests.")
+        parser.add_argument("--retry-failed", action="store_true", help="Retry cities whose last lookup failed.")
+        parser.add_argument("--refresh", action="store_true", help="Geocode every city again, even if already stored.")
+
+    def handle(self, *args, **options):
+        raw_names_by_key = {}
+        for city in Contact.objects.values_list("city", flat=True).distinct().iterator():
+            key = normalize_city_name(city)
+            if key:
+                raw_names_by_key.setdefault(key, []).append(city)
+
+        skipped_statuses = set()
+        if not options["refresh"]:
+            skipped_statuses = {CityLocation.LookupStatus.RESOLVED, CityLocation.LookupStatus.NOT_FOUND}
+            if not options["retry_failed"]:
+                skipped_statuses.add(CityLocation.LookupStatus.FAILED)
+        known = dict(
+            CityLocation.objects.filter(lookup_status__in=skipped_statuses).values_list("name", "id")
+        )
+
+        pending_keys = sorted(key for key in raw_names_by_key if key not in known)
+        self.stdout.write(f"{len(pending_keys)} of {len(raw_names_by_key)} cities need geocoding")
+
+        resolved_count = 0
+        failed_count = 0
+        batch_size = max(1, options["batch_size"])
+        for i in range(0, len(pending_keys), batch_size):
+            batch = pending_keys[i:i + batch_size]
+            for key in batch:
+                try:
+                    location = geocode_city(raw_names_by_key[key][0])
+                except requests.RequestException as exc:
+                    failed_count += 1
+                    self.stderr.write(f"Failed to geocode '{key}': {exc}")
+                else:
+                    if location.coordinates:
+                        resolved_count += 1
+                time.sleep(options["delay"])
+            self.stdout.write(f"Geocoded {min(i + batch_size, len(pending_keys))}/{len(pending_keys)} cities")
+
+        linked_count = self.link_contacts(raw_names_by_key)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Resolved {resolved_count} new cities, {failed_count} failed, "
+                f"linked {linked_count} contact(s) to their location"
+            )
+        )
+
+    def link_contacts(self, raw_names_by_key):
+        linked_count = 0
+        locations = CityLocation.objects.filter(name__in=list(raw_names_by_key)).values_list("name", "id")
+        for name, location_id in locations.iterator():
+            linked_count += (
+                Contact.objects.filter(city__in=raw_names_by_key[name])
+                .exclude(location_id=location_id)
+                .update(location_id=location_id)
+            )
+        return linked_count
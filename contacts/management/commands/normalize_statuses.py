@@ -1,47 +1,95 @@
+import time
+from collections import Counter
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, Exists, Max, Min, OuterRef, Value, When
+from contacts.counters import STATUS, apply_counter_deltas
 from contacts.models import Contact, ContactStatus
-
-STATUS_NAME_MAPPING = {
-    "nowy": "new",
-    "zagubiony": "lost",
-    "w trakcie": "in progress",
-    "nieaktualny": "outdated",
-}
+from contacts.statuses import STATUS_NAME_MAPPING
+from contacts.versioning import bump_data_version
 
 
 class Command(BaseCommand):
     help = "Migrates contacts from Polish status names to English status names"
 
-    def handle(self, *args, **options):
-        migrated_count = 0
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Contact ids remapped per transaction; 0 remaps everything in one transaction.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
 
-        for polish_name, english_name in STATUS_NAME_MAPPING.items():
-            try:
-                polish_status = ContactStatus.objects.get(name=polish_name)
-                english_status, _ = ContactStatus.objects.get_or_create(name=english_name)
-
-                contacts_count = Contact.objects.filter(status=polish_status).count()
-                
-                if contacts_count > 0:
-                    Contact.objects.filter(status=polish_status).update(status=english_status)
-                    migrated_count += contacts_count
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Migrated {contacts_count} contact(s) from '{polish_name}' to '{english_name}'"
-                        )
-                    )
-
-                if not Contact.objects.filter(status=polish_status).exists():
-                    polish_status.delete()
-                    self.stdout.write(
-                        self.style.SUCCESS(f"Deleted status '{polish_name}' (no longer in use)")
-                    )
-            except ContactStatus.DoesNotExist:
-                pass
-        
-        if migrated_count == 0:
+    def handle(self, *args, **options):
+        statuses = {status.name: status for status in ContactStatus.objects.filter(
+            name__in=[*STATUS_NAME_MAPPING, *STATUS_NAME_MAPPING.values()]
+        )}
+        sources = {name: statuses[name] for name in STATUS_NAME_MAPPING if name in statuses}
+        if not sources:
             self.stdout.write(self.style.WARNING("No Polish statuses found to migrate."))
-        else:
+            return
+
+        source_ids = [status.pk for status in sources.values()]
+        pending = dict(
+            Contact.objects.filter(status_id__in=source_ids).order_by()
+            .values_list("status_id").annotate(count=Count("id"))
+        )
+        for name, status in sources.items():
+            self.stdout.write(f"'{name}' -> '{STATUS_NAME_MAPPING[name]}': {pending.get(status.pk, 0)} contact(s)")
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run, nothing was changed."))
+            return
+
+        missing = [STATUS_NAME_MAPPING[name] for name in sources if STATUS_NAME_MAPPING[name] not in statuses]
+        for name in dict.fromkeys(missing):
+            statuses[name] = ContactStatus.objects.get_or_create(name=name)[0]
+        target_ids = {status.pk: statuses[STATUS_NAME_MAPPING[name]].pk for name, status in sources.items()}
+
+        started_at = time.monotonic()
+        migrated_count = self._remap(target_ids, options["batch_size"], started_at)
+
+        # Contacts added under a Polish status while the remap ran keep that status alive.
+        unused = ContactStatus.objects.filter(pk__in=source_ids).exclude(
+            Exists(Contact.objects.filter(status_id=OuterRef("pk")))
+        )
+        for status in unused:
+            status.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted status '{status.name}' (no longer in use)"))
+
+        elapsed = time.monotonic() - started_at
+        rate = migrated_count / elapsed if elapsed > 0 else migrated_count
+        self.stdout.write(
+            self.style.SUCCESS(f"\nTotal contacts migrated: {migrated_count} in {elapsed:.1f}s ({rate:.0f} contacts/s)")
+        )
+
+    def _remap(self, target_ids, batch_size, started_at):
+        contacts = Contact.objects.filter(status_id__in=list(target_ids)).order_by()
+        bounds = contacts.aggregate(low=Min("id"), high=Max("id"))
+        if bounds["low"] is None:
+            return 0
+        new_status = Case(*[When(status_id=source, then=Value(target)) for source, target in target_ids.items()])
+        step = batch_size if batch_size > 0 else bounds["high"] - bounds["low"] + 1
+
+        migrated_count = 0
+        for low in range(bounds["low"], bounds["high"] + 1, step):
+            batch = contacts.filter(id__gte=low, id__lt=low + step)
+            with transaction.atomic():
+                moved = dict(batch.values_list("status_id").annotate(count=Count("id")))
+                if not moved:
+                    continue
+                batch.update(status_id=new_status)
+                deltas = Counter()
+                for source, count in moved.items():
+                    deltas[(STATUS, str(source))] -= count
+                    deltas[(STATUS, str(target_ids[source]))] += count
+                apply_counter_deltas(deltas)
+                bump_data_version()
+            migrated_count += sum(moved.values())
+            elapsed = time.monotonic() - started_at
             self.stdout.write(
-                self.style.SUCCESS(f"\nTotal contacts migrated: {migrated_count}")
+                f"Remapped {migrated_count} contact(s) up to id {min(low + step, bounds['high'] + 1) - 1} "
+                f"({migrated_count / elapsed if elapsed > 0 else migrated_count:.0f} contacts/s)"
             )
+        return migrated_count
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from contacts.jobs import claim_next_import_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Processes pending CSV import jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep waiting for new jobs until interrupted.")
+        parser.add_argument("--interval", type=int, default=5, help="Seconds between queue polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_import_job()
+            if job is None:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            job = run_import_job(job.pk)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Import job {job.pk} {job.status}: processed {job.rows_processed}, "
+                    f"created {job.created_count}, skipped {job.skipped_count}"
+                )
+            )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from contacts.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recomputes the per-status and per-city contact counters from the contacts table"
+
+    def handle(self, *args, **options):
+        rows = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} counter(s)."))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from contacts.models import Contact
+from contacts.services import refresh_weather_for_cities
+
+
+class Command(BaseCommand):
+    help = "Refreshes cached weather for every distinct contact city"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Number of cities refreshed per round.")
+        parser.add_argument("--loop", action="store_true", help="Keep refreshing until interrupted.")
+        parser.add_argument("--interval", type=int, default=300, help="Seconds between rounds with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            self.refresh(options["chunk_size"])
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def refresh(self, chunk_size):
+        started_at = time.monotonic()
+        cities = sorted(
+            {
+                city.strip()
+                for city in Contact.objects.values_list("city", flat=True).distinct().iterator()
+                if city and city.strip()
+            },
+            key=str.lower,
+        )
+
+        refreshed_count = 0
+        for i in range(0, len(cities), chunk_size):
+            refreshed_count += refresh_weather_for_cities(cities[i:i + chunk_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed weather for {refreshed_count} of {len(cities)} cities "
+                f"in {time.monotonic() - started_at:.1f}s"
+            )
+        )
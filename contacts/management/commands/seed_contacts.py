@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from contacts.seeding import seed_contacts
+
+
+class Command(BaseCommand):
+    help = "Generates realistic Polish test contacts with bulk inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, required=True, help="Number of contacts to create.")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Contacts inserted per transaction.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible data.")
+
+    def handle(self, *args, **options):
+        started_at = time.monotonic()
+
+        def progress(created):
+            elapsed = time.monotonic() - started_at
+            self.stdout.write(f"Created {created}/{options['count']} contact(s) ({created / max(elapsed, 1e-9):.0f}/s)")
+
+        created = seed_contacts(options["count"], batch_size=options["batch_size"], seed=options["seed"],
+                                progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Seeded {created} contact(s) in {time.monotonic() - started_at:.1f}s"))
@@ -0,0 +1,221 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    # Exact, so large counters keep counting by one instead of rounding to 6 significant digits.
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(labelnames, values, **extra):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in [*zip(labelnames, values), *extra.items()]]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le=bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le='+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+request_duration = Histogram("contacts_request_duration_seconds", "Request latency.", ["view"])
+request_queries = Histogram(
+    "contacts_request_queries", "SQL queries per request.", ["view"], buckets=QUERY_COUNT_BUCKETS
+)
+request_db_duration = Histogram("contacts_request_db_seconds", "Time spent in SQL per request.", ["view"])
+render_duration = Histogram("contacts_render_duration_seconds", "Template and JSON rendering time.", ["view"])
+upstream_duration = Histogram("contacts_upstream_duration_seconds", "Upstream HTTP call latency.", ["upstream"])
+upstream_failures = CounterMetric("contacts_upstream_failures_total", "Failed upstream HTTP calls.", ["upstream"])
+cache_lookups = CounterMetric("contacts_cache_lookups_total", "Cache lookups by key prefix.", ["prefix", "result"])
+over_budget = CounterMetric(
+    "contacts_requests_over_budget_total", "Requests over the query or latency budget.", ["view", "budget"]
+)
+METRICS = [
+    request_duration, request_queries, request_db_duration, render_duration,
+    upstream_duration, upstream_failures, cache_lookups, over_budget,
+]
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.cache = defaultdict(lambda: [0, 0])
+        self.upstream = defaultdict(lambda: [0, 0.0])
+
+
+_current = contextvars.ContextVar("contacts_request_metrics", default=None)
+
+
+def start_request():
+    return _current.set(RequestMetrics())
+
+
+def finish_request(token):
+    metrics = _current.get()
+    _current.reset(token)
+    return metrics
+
+
+def record_query(execute, sql, params, many, context):
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.sql_count += 1
+            metrics.sql_time += time.perf_counter() - started_at
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # Every thread opens its own connection, so this also covers queries run through sync_to_async.
+    # Outside a request there are no metrics to update and record_query only times the call.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_cache_lookup(prefix, hits, misses):
+    if hits:
+        cache_lookups.inc(hits, prefix=prefix, result="hit")
+    if misses:
+        cache_lookups.inc(misses, prefix=prefix, result="miss")
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache[prefix][0] += hits
+        metrics.cache[prefix][1] += misses
+
+
+def record_upstream(name, seconds, failed=False):
+    upstream_duration.observe(seconds, upstream=name)
+    if failed:
+        upstream_failures.inc(upstream=name)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.upstream[name][0] += 1
+        metrics.upstream[name][1] += seconds
+
+
+@contextmanager
+def measure_render():
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.render_time += time.perf_counter() - started_at
+
+
+def server_timing(metrics, total):
+    entries = [
+        f"total;dur={total * 1000:.1f}",
+        f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.sql_count} queries"',
+    ]
+    if metrics.render_time:
+        entries.append(f"render;dur={metrics.render_time * 1000:.1f}")
+    for name, (calls, seconds) in sorted(metrics.upstream.items()):
+        entries.append(f'upstream-{name};dur={seconds * 1000:.1f};desc="{calls} calls"')
+    for prefix, (hits, misses) in sorted(metrics.cache.items()):
+        entries.append(f'cache-{prefix};desc="{hits} hits, {misses} misses"')
+    return ", ".join(entries)
+
+
+def observe_request(view, metrics, total):
+    request_duration.observe(total, view=view)
+    request_queries.observe(metrics.sql_count, view=view)
+    request_db_duration.observe(metrics.sql_time, view=view)
+    if metrics.render_time:
+        render_duration.observe(metrics.render_time, view=view)
+
+
+def render_metrics(upstream_clients=()):
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    gauges = [
+        ("contacts_upstream_in_flight", "Upstream calls in flight.", "in_flight"),
+        ("contacts_upstream_connections_opened", "Connections opened by the upstream pool.", "connections_opened"),
+    ]
+    stats = [client.stats() for client in upstream_clients]
+    for name, help_text, field in gauges:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        lines += [f'{name}{_format_labels(["upstream"], [entry["name"]])} {entry[field]}' for entry in stats]
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    for metric in METRICS:
+        metric.clear()
@@ -0,0 +1,70 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import finish_request, observe_request, over_budget, server_timing, start_request
+
+logger = logging.getLogger("contacts.performance")
+
+
+class InstrumentationMiddleware:
+    """Times SQL, cache, upstream and rendering work for each request.
+
+    Totals are sent back in a ``Server-Timing`` header, fed into the histograms
+    served at ``/metrics`` and logged when a request goes over its budget.
+    SQL is counted by the wrapper every connection gets when it opens (see
+    ``install_query_recorder``), so queries made on sync_to_async threads count too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = start_request()
+        started_at = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics = finish_request(token)
+        return self._process(request, response, metrics, time.perf_counter() - started_at)
+
+    async def __acall__(self, request):
+        token = start_request()
+        started_at = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics = finish_request(token)
+        return self._process(request, response, metrics, time.perf_counter() - started_at)
+
+    def _process(self, request, response, metrics, total):
+        view = getattr(request.resolver_match, "view_name", None) or "unmatched"
+        observe_request(view, metrics, total)
+        if settings.CONTACTS_SERVER_TIMING:
+            response["Server-Timing"] = server_timing(metrics, total)
+        self._check_budget(request, view, metrics, total)
+        return response
+
+    def _check_budget(self, request, view, metrics, total):
+        exceeded = []
+        if metrics.sql_count > settings.CONTACTS_QUERY_BUDGET:
+            exceeded.append("queries")
+        if total * 1000 > settings.CONTACTS_LATENCY_BUDGET_MS:
+            exceeded.append("latency")
+        for budget in exceeded:
+            over_budget.inc(view=view, budget=budget)
+        if exceeded:
+            logger.warning(
+                "%s %s over budget (%s): %.1f ms, %d queries (%.1f ms SQL)",
+                request.method, request.get_full_path(), ", ".join(exceeded),
+                total * 1000, metrics.sql_count, metrics.sql_time * 1000,
+            )
@@ -0,0 +1,98 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:51
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Frozen copies of contacts.search as of this migration, so later edits there do not change it.
+FTS_TABLE = "contacts_contact_fts"
+EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D", "ß": "ss"})
+
+
+def fold_text(value):
+    decomposed = unicodedata.normalize("NFKD", (value or "").translate(EXTRA_FOLDS))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+def build_search_vector(first_name, last_name, email, phone_number, city):
+    phone_digits = "".join(filter(str.isdigit, phone_number or ""))
+    parts = [first_name, last_name, email, phone_number, phone_digits, city]
+    return " ".join(fold_text(part) for part in parts if part)
+
+
+def populate_search_vector(apps, schema_editor):
+    Contact = apps.get_model("contacts", "Contact")
+    batch = []
+    for contact in Contact.objects.using(schema_editor.connection.alias).iterator(chunk_size=2000):
+        contact.search_vector = build_search_vector(
+            contact.first_name, contact.last_name, contact.email, contact.phone_number, contact.city
+        )
+        batch.append(contact)
+        if len(batch) >= 2000:
+            Contact.objects.bulk_update(batch, ["search_vector"])
+            batch = []
+    if batch:
+        Contact.objects.bulk_update(batch, ["search_vector"])
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "search_vector, content='contacts_contact', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON contacts_contact BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, search_vector) VALUES (new.id, new.search_vector); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON contacts_contact BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_vector) "
+            "VALUES ('delete', old.id, old.search_vector); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF search_vector ON contacts_contact BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_vector) "
+            "VALUES ('delete', old.id, old.search_vector); "
+            f"INSERT INTO {FTS_TABLE}(rowid, search_vector) VALUES (new.id, new.search_vector); END"
+        )
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS contacts_contact_search_trgm "
+            "ON contacts_contact USING gin (search_vector gin_trgm_ops)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS contacts_contact_search_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0003_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='search_vector',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+DEFAULT_STATUS_NAMES = ["new", "in progress", "lost", "outdated"]
+
+
+def seed_statuses(apps, schema_editor):
+    ContactStatus = apps.get_model("contacts", "ContactStatus")
+    for name in DEFAULT_STATUS_NAMES:
+        ContactStatus.objects.using(schema_editor.connection.alias).get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0005_contact_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_statuses, migrations.RunPython.noop),
+    ]
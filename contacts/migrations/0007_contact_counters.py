@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:09
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    Contact = apps.get_model("contacts", "Contact")
+    ContactCounter = apps.get_model("contacts", "ContactCounter")
+    alias = schema_editor.connection.alias
+    contacts = Contact.objects.using(alias).order_by()
+    rows = [
+        ContactCounter(kind="status", key=str(status_id), count=count)
+        for status_id, count in contacts.values_list("status_id").annotate(count=Count("id"))
+    ]
+    rows += [
+        ContactCounter(kind="city", key=city, count=count)
+        for city, count in contacts.values_list("city").annotate(count=Count("id"))
+    ]
+    ContactCounter.objects.using(alias).bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0006_seed_contact_statuses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('status', 'Status'), ('city', 'City')], max_length=10)),
+                ('key', models.CharField(max_length=120)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['kind', 'key'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='contact_counter_kind_key_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,12 @@
 from django.db import models
+from django.utils import timezone
+
+from .search import build_search_vector
+
+
+def normalize_city_name(city_name: str):
+    return " ".join((city_name or "").split()).lower()
+
 
 class ContactStatus(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -10,6 +18,32 @@ class ContactStatus(models.Model):
         return self.name
 
 
+class CityLocation(models.Model):
+    class LookupStatus(models.TextChoices):
+        RESOLVED = "resolved", "Resolved"
+        NOT_FOUND = "not_found", "Not found"
+        FAILED = "failed", "Failed"
+
+    name = models.CharField(max_length=120, unique=True)
+    lat = models.FloatField(null=True, blank=True)
+    lon = models.FloatField(null=True, blank=True)
+    lookup_status = models.CharField(max_length=20, choices=LookupStatus.choices, default=LookupStatus.RESOLVED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def coordinates(self):
+        if self.lookup_status != self.LookupStatus.RESOLVED or self.lat is None or self.lon is None:
+            return None
+        return {"lat": self.lat, "lon": self.lon}
+
+
 class Contact(models.Model):
     first_name = models.CharField(max_length=80)
     last_name = models.CharField(max_length=80)
@@ -17,10 +51,105 @@ class Contact(models.Model):
     email = models.EmailField(unique=True)
     city = models.CharField(max_length=120)
     status = models.ForeignKey(ContactStatus, on_delete=models.PROTECT, related_name="contacts")
+    location = models.ForeignKey(
+        CityLocation, on_delete=models.SET_NULL, null=True, blank=True, related_name="contacts"
+    )
+    search_vector = models.TextField(blank=True, default="", editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["last_name", "-created_at"]
+        ordering = ["last_name", "first_name", "id"]
+        indexes = [
+            models.Index(fields=["last_name", "first_name", "id"], name="contact_name_order_idx"),
+            models.Index(fields=["created_at", "id"], name="contact_created_order_idx"),
+            models.Index(fields=["status", "last_name"], name="contact_status_last_name_idx"),
+            models.Index(fields=["city"], name="contact_city_idx"),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Counters and the location link need the values a contact had before it was edited.
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in ("status_id", "city")
+        }
+        return instance
+
+    def update_search_vector(self):
+        self.search_vector = build_search_vector(
+            self.first_name, self.last_name, self.email, self.phone_number, self.city
+        )
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, "_loaded_values", {})
+        # The location only follows the city, so an unchanged city keeps its link without a query.
+        if self.location_id is None or "city" not in loaded or loaded["city"] != self.city:
+            self.location = CityLocation.objects.filter(name=normalize_city_name(self.city)).first()
+        self.update_search_vector()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "location", "search_vector"}
+        super().save(*args, **kwargs)
+
+
+class ContactCounter(models.Model):
+    class Kind(models.TextChoices):
+        STATUS = "status", "Status"
+        CITY = "city", "City"
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    key = models.CharField(max_length=120)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["kind", "key"]
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "key"], name="contact_counter_kind_key_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.key}: {self.count}"
+
+
+class ImportJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    file = models.FileField(upload_to="imports/")
+    original_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Import {self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.COMPLETED, self.Status.FAILED)
+
+    @property
+    def throughput(self):
+        if not self.started_at:
+            return None
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        if elapsed <= 0:
+            return None
+        return round(self.rows_processed / elapsed, 1)
@@ -0,0 +1,147 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import CursorPagination
+
+SORT_ORDERS = {
+    "last_name": ("last_name", "first_name", "id"),
+    "created_at": ("-created_at", "-id"),
+}
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values, direction="next"):
+    values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    payload = json.dumps({"v": values, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, fields):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        values = payload["v"]
+        direction = payload.get("d", "next")
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    if direction not in ("next", "prev") or not isinstance(values, list) or len(values) != len(fields):
+        return None
+
+    decoded_values = []
+    for field, value in zip(fields, values):
+        name = field.lstrip("-")
+        if name.endswith("_at"):
+            value = parse_datetime(value) if isinstance(value, str) else None
+        elif name == "id":
+            # bool is an int subclass, but True is never a contact id.
+            value = value if isinstance(value, int) and not isinstance(value, bool) else None
+        elif not isinstance(value, str):
+            value = None
+        if value is None:
+            return None
+        decoded_values.append(value)
+    return decoded_values, direction
+
+
+def _keyset_filter(fields, values, backwards=False):
+    condition = Q()
+    for index, field in enumerate(fields):
+        name = field.lstrip("-")
+        descending = field.startswith("-")
+        lookup = "lt" if descending != backwards else "gt"
+        clause = Q(**{f"{name}__{lookup}": values[index]})
+        for previous_field, previous_value in zip(fields[:index], values[:index]):
+            clause &= Q(**{previous_field.lstrip("-"): previous_value})
+        condition |= clause
+    return condition
+
+
+def _reversed_ordering(fields):
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in fields]
+
+
+def _cursor_values(obj, fields):
+    return [getattr(obj, field.lstrip("-")) for field in fields]
+
+
+def _keyset_query(queryset, fields, decoded):
+    if decoded is None:
+        return queryset.order_by(*fields), "first"
+    values, direction = decoded
+    if direction == "prev":
+        queryset = queryset.filter(_keyset_filter(fields, values, backwards=True))
+        return queryset.order_by(*_reversed_ordering(fields)), "prev"
+    return queryset.filter(_keyset_filter(fields, values)).order_by(*fields), "next"
+
+
+def _build_page(rows, fields, mode, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if mode == "first":
+        next_cursor = encode_cursor(_cursor_values(rows[-1], fields)) if has_more else None
+        return KeysetPage(rows, next_cursor=next_cursor)
+
+    if mode == "prev":
+        rows = rows[::-1]
+        if not rows:
+            return KeysetPage(rows)
+        previous_cursor = encode_cursor(_cursor_values(rows[0], fields), "prev") if has_more else None
+        next_cursor = encode_cursor(_cursor_values(rows[-1], fields))
+        return KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+    if not rows:
+        return KeysetPage(rows)
+    next_cursor = encode_cursor(_cursor_values(rows[-1], fields)) if has_more else None
+    previous_cursor = encode_cursor(_cursor_values(rows[0], fields), "prev")
+    return KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+
+def paginate_keyset(queryset, sort_key, cursor=None, page_size=50):
+    fields = SORT_ORDERS.get(sort_key, SORT_ORDERS["last_name"])
+    query, mode = _keyset_query(queryset, fields, decode_cursor(cursor, fields))
+    return _build_page(list(query[: page_size + 1]), fields, mode, page_size)
+
+
+async def apaginate_keyset(queryset, sort_key, cursor=None, page_size=50):
+    fields = SORT_ORDERS.get(sort_key, SORT_ORDERS["last_name"])
+    query, mode = _keyset_query(queryset, fields, decode_cursor(cursor, fields))
+    rows = [row async for row in query[: page_size + 1]]
+    return _build_page(rows, fields, mode, page_size)
+
+
+class ContactCursorPagination(CursorPagination):
+    ordering = "id"
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request):
+        # Read per request rather than at import time, so setting changes and override_settings apply.
+        self.page_size = settings.CONTACTS_API_PAGE_SIZE
+        self.max_page_size = settings.CONTACTS_MAX_PAGE_SIZE
+        return super().get_page_size(request)
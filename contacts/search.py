@@ -0,0 +1,57 @@
+import unicodedata
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "contacts_contact_fts"
+MIN_INDEXED_TERM_LENGTH = 3
+
+# Letters that have no Unicode decomposition into a base letter plus accent.
+EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D", "ß": "ss"})
+
+_fts_available = {}
+
+
+def fold_text(value: str):
+    decomposed = unicodedata.normalize("NFKD", (value or "").translate(EXTRA_FOLDS))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+def build_search_vector(first_name, last_name, email, phone_number, city):
+    phone_digits = "".join(filter(str.isdigit, phone_number or ""))
+    parts = [first_name, last_name, email, phone_number, phone_digits, city]
+    return " ".join(fold_text(part) for part in parts if part)
+
+
+def _quote_fts_term(term: str):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def fts_available(using="default"):
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[using]
+
+
+def search_contacts(queryset, query: str):
+    terms = fold_text(query).split()
+    if not terms:
+        return queryset
+
+    indexed_terms = [term for term in terms if len(term) >= MIN_INDEXED_TERM_LENGTH]
+    if indexed_terms and fts_available(queryset.db):
+        # The trigram tokenizer makes every quoted term a substring match on the folded text.
+        match_expression = " ".join(_quote_fts_term(term) for term in indexed_terms)
+        queryset = queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match_expression])
+        )
+        terms = [term for term in terms if len(term) < MIN_INDEXED_TERM_LENGTH]
+
+    # On PostgreSQL these LIKE lookups use the pg_trgm index on search_vector.
+    for term in terms:
+        queryset = queryset.filter(search_vector__contains=term)
+    return queryset
@@ -0,0 +1,98 @@
+import random
+from itertools import accumulate
+
+from django.db import transaction
+from django.db.models import Max
+
+from .counters import apply_counter_deltas, count_contacts
+from .models import CityLocation, Contact, normalize_city_name
+from .search import fold_text
+from .statuses import get_or_create_status
+from .versioning import bump_data_version
+
+FIRST_NAMES = {
+    "m": ["Jan", "Piotr", "Krzysztof", "Andrzej", "Tomasz", "Paweł", "Michał", "Marcin", "Łukasz", "Jakub",
+          "Mateusz", "Grzegorz", "Adam", "Wojciech", "Kamil", "Maciej", "Rafał", "Dawid", "Szymon", "Bartosz"],
+    "f": ["Anna", "Maria", "Katarzyna", "Małgorzata", "Agnieszka", "Barbara", "Ewa", "Magdalena", "Joanna",
+          "Aleksandra", "Zofia", "Monika", "Natalia", "Julia", "Karolina", "Marta", "Beata", "Dorota", "Łucja", "Ola"],
+}
+# Surnames ending in -ski/-cki/-dzki take -ska/-cka/-dzka for women; the others do not change.
+LAST_NAMES = ["Nowak", "Kowalski", "Wiśniewski", "Wójcik", "Kowalczyk", "Kamiński", "Lewandowski", "Zieliński",
+              "Szymański", "Woźniak", "Dąbrowski", "Kozłowski", "Jankowski", "Mazur", "Kwiatkowski", "Krawczyk",
+              "Piotrowski", "Grabowski", "Nowakowski", "Pawłowski", "Michalski", "Król", "Wieczorek", "Jabłoński",
+              "Wróbel", "Nowicki", "Majewski", "Olszewski", "Stępień", "Jaworski", "Malinowski", "Adamczyk",
+              "Dudek", "Zając", "Górski", "Sikora", "Walczak", "Baran", "Rutkowski", "Michalak"]
+# Ordered by population, so the Zipf-like weights below give a realistic skew.
+CITIES = ["Warszawa", "Kraków", "Wrocław", "Łódź", "Poznań", "Gdańsk", "Szczecin", "Bydgoszcz", "Lublin",
+          "Białystok", "Katowice", "Gdynia", "Częstochowa", "Radom", "Rzeszów", "Toruń", "Sosnowiec", "Kielce",
+          "Gliwice", "Olsztyn", "Zabrze", "Bielsko-Biała", "Bytom", "Zielona Góra", "Rybnik", "Ruda Śląska",
+          "Opole", "Tychy", "Gorzów Wielkopolski", "Elbląg", "Płock", "Wałbrzych", "Włocławek", "Tarnów",
+          "Chorzów", "Koszalin", "Kalisz", "Legnica", "Grudziądz", "Słupsk", "Zakopane", "Sopot", "Hel"]
+CITY_WEIGHTS = list(accumulate(1 / rank for rank in range(1, len(CITIES) + 1)))
+STATUS_WEIGHTS = {"new": 40, "in progress": 30, "lost": 15, "outdated": 15}
+
+
+def _female_form(last_name):
+    for suffix in ("ski", "cki", "dzki"):
+        if last_name.endswith(suffix):
+            return last_name[:-1] + "a"
+    return last_name
+
+
+def generate_contact_rows(count, start=1, seed=None):
+    """Yields import-style dicts for ``count`` contacts numbered from ``start``.
+
+    Phone numbers and emails embed the contact number, so rows from different
+    ``start`` offsets never collide.
+    """
+    rng = random.Random(seed)
+    status_names = list(STATUS_WEIGHTS)
+    status_weights = list(accumulate(STATUS_WEIGHTS.values()))
+    for number in range(start, start + count):
+        gender = rng.choice("mf")
+        first_name = rng.choice(FIRST_NAMES[gender])
+        last_name = rng.choice(LAST_NAMES)
+        if gender == "f":
+            last_name = _female_form(last_name)
+        local_part = f"{fold_text(first_name)}.{fold_text(last_name)}.{number}".replace(" ", "")
+        yield {
+            "first_name": first_name,
+            "last_name": last_name,
+            "phone_number": f"+48{500000000 + number}",
+            "email": f"{local_part}@example.com",
+            "city": rng.choices(CITIES, cum_weights=CITY_WEIGHTS)[0],
+            "status": rng.choices(status_names, cum_weights=status_weights)[0],
+        }
+
+
+def next_seed_number():
+    return (Contact.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def seed_contacts(count, batch_size=2000, seed=None, progress=None):
+    statuses = {name: get_or_create_status(name) for name in STATUS_WEIGHTS}
+    location_ids = {
+        name: location_id
+        for name, location_id in CityLocation.objects.filter(
+            name__in={normalize_city_name(city) for city in CITIES}
+        ).values_list("name", "id")
+    }
+    rows = generate_contact_rows(count, start=next_seed_number(), seed=seed)
+    created = 0
+    while created < count:
+        contacts = []
+        for row in rows:
+            contact = Contact(**{**row, "status": statuses[row["status"]]})
+            contact.location_id = location_ids.get(normalize_city_name(contact.city))
+            contact.update_search_vector()
+            contacts.append(contact)
+            if len(contacts) == batch_size:
+                break
+        with transaction.atomic():
+            Contact.objects.bulk_create(contacts, batch_size=batch_size)
+            apply_counter_deltas(count_contacts(contacts))
+            bump_data_version()
+        created += len(contacts)
+        if progress:
+            progress(created)
+    return created
@@ -1,13 +1,46 @@
+import functools
+
 from rest_framework import serializers
-from .models import Contact, ContactStatus
+from .models import Contact, ContactStatus, ImportJob
+from .statuses import get_status, get_status_by_id
 
 class ContactStatusSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContactStatus
         fields = ["id", "name"]
 
-class ContactSerializer(serializers.ModelSerializer):
-    status = serializers.SlugRelatedField(slug_field="name", queryset=ContactStatus.objects.all())
+class StatusField(serializers.SlugRelatedField):
+    def __init__(self, **kwargs):
+        super().__init__(slug_field="name", queryset=ContactStatus.objects.all(), **kwargs)
+
+    def get_attribute(self, instance):
+        status = get_status_by_id(instance.status_id)
+        return status if status is not None else super().get_attribute(instance)
+
+    def to_internal_value(self, data):
+        status = get_status(str(data))
+        if status is None:
+            self.fail("does_not_exist", slug_name=self.slug_field, value=str(data))
+        return status
+
+
+def requested_fields(request):
+    if request is None or request.method not in ("GET", "HEAD"):
+        return set()
+    return {name.strip() for name in request.query_params.get("fields", "").split(",") if name.strip()}
+
+
+class SparseFieldsetMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get("request"))
+        if requested:
+            for field_name in set(self.fields) - requested:
+                self.fields.pop(field_name)
+
+
+class ContactSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    status = StatusField()
     phone_number = serializers.CharField(write_only=True, required=False)
     email = serializers.EmailField(write_only=True, required=False)
 
@@ -17,7 +50,7 @@ class ContactSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at"]
     
     def validate(self, data):
-        if self.instance is None:
+        if self.instance is None and not self.partial:
             errors = {}
             if not data.get('phone_number'):
                 errors['phone_number'] = "This field is required when creating a contact."
@@ -25,4 +58,53 @@ class ContactSerializer(serializers.ModelSerializer):
                 errors['email'] = "This field is required when creating a contact."
             if errors:
                 raise serializers.ValidationError(errors)
-        return data
\ No newline at end of file
+        return data
+
+
+CONTACT_VALUE_COLUMNS = {"status": "status__name"}
+
+
+class ContactRowMapper:
+    """Turns ``.values()`` rows into the dicts ContactSerializer returns for reads, without model instances."""
+
+    def __init__(self, fields):
+        serializer_fields = ContactSerializer().fields
+        # Write-only fields (phone_number, email) are never read, same as in the serializer.
+        self.fields = [name for name, field in serializer_fields.items() if not field.write_only and name in fields]
+        self.columns = [CONTACT_VALUE_COLUMNS.get(name, name) for name in self.fields]
+        self._pairs = list(zip(self.fields, self.columns))
+        self._formatters = [
+            (name, serializer_fields[name].to_representation)
+            for name in self.fields
+            if isinstance(serializer_fields[name], serializers.DateTimeField)
+        ]
+
+    def __call__(self, row):
+        data = {name: row[column] for name, column in self._pairs}
+        for name, to_representation in self._formatters:
+            if data[name] is not None:
+                data[name] = to_representation(data[name])
+        return data
+
+
+@functools.lru_cache(maxsize=64)
+def _contact_row_mapper(fields):
+    return ContactRowMapper(fields)
+
+
+def contact_row_mapper(request):
+    requested = requested_fields(request)
+    return _contact_row_mapper(frozenset(requested or ContactSerializer.Meta.fields))
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    throughput = serializers.FloatField(read_only=True)
+    is_finished = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id", "original_name", "status", "is_finished", "rows_processed", "created_count", "skipped_count",
+            "throughput", "errors", "error_message", "created_at", "started_at", "finished_at",
+        ]
+        read_only_fields = fields
@@ -1,65 +1,225 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+
 import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.cache import cache
+from django.db import DatabaseError, connections
 
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
-OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+from .http import nominatim_client, open_meteo_client
+from .metrics import record_cache_lookup
+from .models import CityLocation, normalize_city_name
 
-def get_city_coordinates(city_name: str):
-    normalized_city = (city_name or "").strip()
-    if not normalized_city:
-        return None
+CITY_COORDS_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+CITY_NOT_FOUND_CACHE_TIMEOUT = 60 * 60 * 24
+CITY_LOOKUP_FAILED_CACHE_TIMEOUT = 60 * 5
+WEATHER_FRESH_TIMEOUT = 60 * 10
+WEATHER_STALE_TIMEOUT = 60 * 60 * 24
+WEATHER_REFRESH_LOCK_TIMEOUT = 60
 
-    cache_key = f"city_coords:{normalized_city.lower()}"
-    cached_value = cache.get(cache_key)
-    if cached_value:
-        return cached_value
+_executors = {}
+_executors_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
 
-    response = requests.get(
-        NOMINATIM_URL,
-        params={"q": normalized_city, "format": "json", "limit": 1},
-        headers={"User-Agent": "contacts-django-app/1.0"},
-        timeout=10,
-    )
-    response.raise_for_status()
-    data = response.json()
+# Cached in place of coordinates, because a cached None cannot be told apart from a miss.
+CITY_NOT_FOUND = "not_found"
+CITY_LOOKUP_FAILED = "lookup_failed"
+
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            return time.monotonic() >= self.open_until
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # Once tripped, a single failed probe after the cooldown opens the circuit again.
+            if self.failures >= settings.UPSTREAM_FAILURE_THRESHOLD:
+                self.open_until = time.monotonic() + settings.UPSTREAM_COOLDOWN
+
+    def call(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable, skipping the request")
+        try:
+            result = func(*args, **kwargs)
+        except requests.RequestException:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable, skipping the request")
+        try:
+            result = await func(*args, **kwargs)
+        except requests.RequestException:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+nominatim_breaker = CircuitBreaker("nominatim")
+open_meteo_breaker = CircuitBreaker("open-meteo")
+
+
+def reset_circuit_breakers():
+    for breaker in (nominatim_breaker, open_meteo_breaker):
+        breaker.record_success()
+
+
+def _city_coords_cache_key(city_name: str):
+    return f"city_coords:{normalize_city_name(city_name)}"
+
+
+def _record_city_coordinates_lookup(cached_value):
+    hit = cached_value is not None
+    record_cache_lookup("city_coords", int(hit), int(not hit))
+    return cached_value
+
+
+def _cached_city_coordinates(normalized_city: str):
+    return _record_city_coordinates_lookup(cache.get(_city_coords_cache_key(normalized_city)))
+
+
+async def _acached_city_coordinates(normalized_city: str):
+    return _record_city_coordinates_lookup(await cache.aget(_city_coords_cache_key(normalized_city)))
+
+
+def _request_city_coordinates(city_name: str):
+    return nominatim_breaker.call(_get_city_coordinates, city_name)
+
+
+def _geocode_params(city_name: str):
+    return {"q": city_name, "format": "json", "limit": 1}
+
+
+def _parse_city_coordinates(data):
     if not data:
-        cache.set(cache_key, None, 60 * 60 * 24)
         return None
+    return {"lat": float(data[0]["lat"]), "lon": float(data[0]["lon"])}
 
-    coords = {"lat": float(data[0]["lat"]), "lon": float(data[0]["lon"])}
-    cache.set(cache_key, coords, 60 * 60 * 24 * 30)
-    return coords
 
+def _get_city_coordinates(city_name: str):
+    response = nominatim_client.get(params=_geocode_params(city_name), timeout=10)
+    return _parse_city_coordinates(response.json())
 
-def get_current_weather_for_city(city_name: str):
+
+def _city_location_cache_entry(location):
+    coords = location.coordinates
+    if coords:
+        return coords, CITY_COORDS_CACHE_TIMEOUT
+    return CITY_NOT_FOUND, CITY_NOT_FOUND_CACHE_TIMEOUT
+
+
+def _location_defaults(coords):
+    if coords is None:
+        return {"lat": None, "lon": None, "lookup_status": CityLocation.LookupStatus.NOT_FOUND}
+    return {**coords, "lookup_status": CityLocation.LookupStatus.RESOLVED}
+
+
+def _cache_city_location(location):
+    value, timeout = _city_location_cache_entry(location)
+    cache.set(_city_coords_cache_key(location.name), value, timeout)
+    return location.coordinates
+
+
+def geocode_city(city_name: str):
+    normalized_city = (city_name or "").strip()
+    try:
+        coords = _request_city_coordinates(normalized_city)
+    except CircuitOpenError:
+        raise
+    except requests.RequestException:
+        CityLocation.objects.update_or_create(
+            name=normalize_city_name(normalized_city),
+            defaults={"lookup_status": CityLocation.LookupStatus.FAILED},
+        )
+        cache.set(_city_coords_cache_key(normalized_city), CITY_LOOKUP_FAILED, CITY_LOOKUP_FAILED_CACHE_TIMEOUT)
+        raise
+
+    location, _ = CityLocation.objects.update_or_create(
+        name=normalize_city_name(normalized_city), defaults=_location_defaults(coords)
+    )
+    _cache_city_location(location)
+    return location
+
+
+def _lookup_city_coordinates(city_name: str):
     normalized_city = (city_name or "").strip()
     if not normalized_city:
         return None
 
-    cache_key = f"weather:{normalized_city.lower()}"
-    cached_value = cache.get(cache_key)
-    if cached_value:
+    cached_value = _cached_city_coordinates(normalized_city)
+    if cached_value in (CITY_NOT_FOUND, CITY_LOOKUP_FAILED):
+        return None
+    if cached_value is not None:
         return cached_value
 
-    coords = get_city_coordinates(normalized_city)
-    if not coords:
-        cache.set(cache_key, None, 60 * 10)
+    location = CityLocation.objects.filter(name=normalize_city_name(normalized_city)).first()
+    if location and location.lookup_status != CityLocation.LookupStatus.FAILED:
+        return _cache_city_location(location)
+
+    return geocode_city(normalized_city).coordinates
+
+
+def get_city_coordinates(city_name: str):
+    try:
+        return _lookup_city_coordinates(city_name)
+    except requests.RequestException:
         return None
 
-    response = requests.get(
-        OPEN_METEO_URL,
-        params={
-            "latitude": coords["lat"],
-            "longitude": coords["lon"],
-            "current_weather": "true",
-            "hourly": "relativehumidity_2m",
-            "forecast_days": 1,
-        },
-        timeout=10,
+
+def _geocode_in_thread(city_name: str):
+    try:
+        return _lookup_city_coordinates(city_name)
+    finally:
+        connections.close_all()
+
+
+def _weather_cache_key(normalized_city: str):
+    return f"weather:{normalize_city_name(normalized_city)}"
+
+
+def _record_weather_lookup(normalized_cities, entries):
+    record_cache_lookup("weather", len(entries), len(normalized_cities) - len(entries))
+    return entries
+
+
+def _cached_weather_entries(normalized_cities):
+    return _record_weather_lookup(
+        normalized_cities, cache.get_many([_weather_cache_key(key) for key in normalized_cities])
+    )
+
+
+async def _acached_weather_entries(normalized_cities):
+    return _record_weather_lookup(
+        normalized_cities, await cache.aget_many([_weather_cache_key(key) for key in normalized_cities])
     )
-    response.raise_for_status()
-    data = response.json()
 
+
+def _build_weather_payload(data):
     current_weather = data.get("current_weather") or {}
     temperature = current_weather.get("temperature")
     windspeed = current_weather.get("windspeed")
@@ -70,10 +230,405 @@ def get_current_weather_for_city(city_name: str):
     if humidity_list:
         humidity = humidity_list[0]
 
-    weather_payload = {
+    return {
         "temperature": temperature,
         "humidity": humidity,
         "windspeed": windspeed,
     }
-    cache.set(cache_key, weather_payload, 60 * 10)
-    return weather_payload
+
+
+def _weather_params(coords_list):
+    return {
+        "latitude": ",".join(str(coords["lat"]) for coords in coords_list),
+        "longitude": ",".join(str(coords["lon"]) for coords in coords_list),
+        "current_weather": "true",
+        "hourly": "relativehumidity_2m",
+        "forecast_days": 1,
+    }
+
+
+def _parse_weather(data):
+    # Open-Meteo answers with a single object for one location and a list for several.
+    if isinstance(data, dict):
+        data = [data]
+    return [_build_weather_payload(item) for item in data]
+
+
+def _fetch_weather_for_coordinates(coords_list, timeout=10):
+    return open_meteo_breaker.call(_get_weather_for_coordinates, coords_list, timeout)
+
+
+def _get_weather_for_coordinates(coords_list, timeout):
+    response = open_meteo_client.get(params=_weather_params(coords_list), timeout=timeout)
+    return _parse_weather(response.json())
+
+
+def _weather_entry(payload):
+    return {"value": payload, "fetched_at": time.time()}
+
+
+def _store_weather(key: str, payload):
+    cache.set(_weather_cache_key(key), _weather_entry(payload), WEATHER_STALE_TIMEOUT)
+
+
+def _is_fresh(entry):
+    return time.time() - entry["fetched_at"] < WEATHER_FRESH_TIMEOUT
+
+
+def _get_executor(name: str, max_workers: int):
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"weather-{name}")
+            _executors[name] = executor
+        return executor
+
+
+def _claim_inflight(keys):
+    leaders = {}
+    followers = {}
+    with _inflight_lock:
+        for key in keys:
+            future = _inflight.get(key)
+            if future is None:
+                future = Future()
+                _inflight[key] = future
+                leaders[key] = future
+            else:
+                followers[key] = future
+    return leaders, followers
+
+
+def _resolve_inflight(key: str, payload):
+    with _inflight_lock:
+        future = _inflight.pop(key, None)
+    if future is not None and not future.done():
+        future.set_result(payload)
+
+
+def _fetch_and_store_weather(cities_by_key, batch_size, coordinates_by_key=None):
+    http_executor = _get_executor("http", settings.WEATHER_MAX_WORKERS)
+    try:
+        coords_by_key = {key: coords for key, coords in (coordinates_by_key or {}).items() if key in cities_by_key}
+        geocode_futures = {
+            http_executor.submit(_geocode_in_thread, city): key
+            for key, city in cities_by_key.items()
+            if key not in coords_by_key
+        }
+        for future in as_completed(geocode_futures):
+            key = geocode_futures[future]
+            try:
+                coords = future.result()
+            except (requests.RequestException, DatabaseError):
+                continue
+            if coords:
+                coords_by_key[key] = coords
+            else:
+                _store_weather(key, None)
+                _resolve_inflight(key, None)
+
+        resolved_keys = list(coords_by_key)
+        weather_futures = {}
+        for i in range(0, len(resolved_keys), batch_size):
+            batch = resolved_keys[i:i + batch_size]
+            future = http_executor.submit(_fetch_weather_for_coordinates, [coords_by_key[key] for key in batch])
+            weather_futures[future] = batch
+        for future in as_completed(weather_futures):
+            batch = weather_futures[future]
+            try:
+                payloads = future.result()
+            except (requests.RequestException, ValueError):
+                continue
+            for key, payload in zip(batch, payloads):
+                _store_weather(key, payload)
+                _resolve_inflight(key, payload)
+    finally:
+        for key in cities_by_key:
+            _resolve_inflight(key, None)
+        cache.delete_many([f"weather_refresh_lock:{key}" for key in cities_by_key])
+
+
+def _start_fetch(cities_by_key, batch_size=None, coordinates_by_key=None):
+    batch_size = batch_size or settings.WEATHER_BATCH_SIZE
+    leaders, followers = _claim_inflight(cities_by_key)
+    if leaders:
+        _get_executor("refresh", settings.WEATHER_REFRESH_WORKERS).submit(
+            _fetch_and_store_weather,
+            {key: cities_by_key[key] for key in leaders},
+            batch_size,
+            coordinates_by_key,
+        )
+    return {**leaders, **followers}
+
+
+def _group_cities(cities):
+    normalized_cities = {}
+    for city in cities:
+        normalized_city = (city or "").strip()
+        if normalized_city:
+            normalized_cities.setdefault(normalize_city_name(normalized_city), []).append(city)
+    return normalized_cities
+
+
+def refresh_weather_in_background(cities, coordinates_by_key=None):
+    cities_by_key = {}
+    for key, originals in _group_cities(cities).items():
+        if cache.add(f"weather_refresh_lock:{key}", 1, WEATHER_REFRESH_LOCK_TIMEOUT):
+            cities_by_key[key] = originals[0].strip()
+    if cities_by_key:
+        _start_fetch(cities_by_key, coordinates_by_key=coordinates_by_key)
+
+
+def refresh_weather_for_cities(cities, batch_size=None):
+    cities_by_key = {key: originals[0].strip() for key, originals in _group_cities(cities).items()}
+    futures = _start_fetch(cities_by_key, batch_size)
+    wait(futures.values())
+    return sum(1 for future in futures.values() if future.result() is not None)
+
+
+def get_current_weather_for_city(city_name: str):
+    return get_weather_for_cities([city_name]).get(city_name)
+
+
+def _coordinates_by_key(coordinates):
+    return {normalize_city_name(city): coords for city, coords in (coordinates or {}).items() if coords}
+
+
+def _apply_cached_weather(normalized_cities, entries, results):
+    missing = {}
+    stale = []
+    for key, originals in normalized_cities.items():
+        entry = entries.get(_weather_cache_key(key))
+        if entry is None:
+            missing[key] = originals[0].strip()
+            continue
+        for city in originals:
+            results[city] = entry["value"]
+        if not _is_fresh(entry):
+            stale.append(originals[0])
+    return missing, stale
+
+
+def _missing_cities(normalized_cities, missing):
+    return [city for key in missing for city in normalized_cities[key]]
+
+
+def uncached_weather_cities(cities):
+    normalized_cities = _group_cities(cities)
+    entries = _cached_weather_entries(normalized_cities)
+    return _missing_cities(normalized_cities, [key for key in normalized_cities if _weather_cache_key(key) not in entries])
+
+
+def peek_weather_for_cities(cities, coordinates=None):
+    # Only reads the cache, so pages can render before upstream APIs answer.
+    normalized_cities = _group_cities(cities)
+    results = {city: None for city in cities}
+    if not normalized_cities:
+        return results, []
+
+    entries = _cached_weather_entries(normalized_cities)
+    missing, stale = _apply_cached_weather(normalized_cities, entries, results)
+    if stale:
+        refresh_weather_in_background(stale, _coordinates_by_key(coordinates))
+    return results, _missing_cities(normalized_cities, missing)
+
+
+def get_weather_for_cities(cities, deadline=None, batch_size=None, coordinates=None):
+    deadline = settings.WEATHER_DEADLINE if deadline is None else deadline
+    normalized_cities = _group_cities(cities)
+    coordinates_by_key = _coordinates_by_key(coordinates)
+
+    results = {city: None for city in cities}
+    if not normalized_cities:
+        return results
+
+    entries = _cached_weather_entries(normalized_cities)
+    missing, stale = _apply_cached_weather(normalized_cities, entries, results)
+
+    if stale:
+        refresh_weather_in_background(stale, coordinates_by_key)
+
+    if missing:
+        futures = _start_fetch(missing, batch_size, coordinates_by_key)
+        wait(futures.values(), timeout=deadline)
+        for key, future in futures.items():
+            if future.done():
+                for city in normalized_cities[key]:
+                    results[city] = future.result()
+
+    return results
+
+
+# Async variants for the ASGI views. They share the caches, circuit breakers and
+# in-flight futures with the thread-based path above.
+
+_UPSTREAM_ERRORS = (requests.RequestException, DatabaseError, ValueError)
+_background_tasks = set()
+
+
+async def _arequest_city_coordinates(city_name: str):
+    return await nominatim_breaker.acall(_aget_city_coordinates, city_name)
+
+
+async def _aget_city_coordinates(city_name: str):
+    response = await nominatim_client.aget(params=_geocode_params(city_name), timeout=10)
+    return _parse_city_coordinates(response.json())
+
+
+async def ageocode_city(city_name: str):
+    normalized_city = (city_name or "").strip()
+    try:
+        coords = await _arequest_city_coordinates(normalized_city)
+    except CircuitOpenError:
+        raise
+    except requests.RequestException:
+        await CityLocation.objects.aupdate_or_create(
+            name=normalize_city_name(normalized_city),
+            defaults={"lookup_status": CityLocation.LookupStatus.FAILED},
+        )
+        await cache.aset(
+            _city_coords_cache_key(normalized_city), CITY_LOOKUP_FAILED, CITY_LOOKUP_FAILED_CACHE_TIMEOUT
+        )
+        raise
+
+    location, _ = await CityLocation.objects.aupdate_or_create(
+        name=normalize_city_name(normalized_city), defaults=_location_defaults(coords)
+    )
+    value, timeout = _city_location_cache_entry(location)
+    await cache.aset(_city_coords_cache_key(location.name), value, timeout)
+    return location
+
+
+async def _alookup_city_coordinates(city_name: str):
+    normalized_city = (city_name or "").strip()
+    if not normalized_city:
+        return None
+
+    cached_value = await _acached_city_coordinates(normalized_city)
+    if cached_value in (CITY_NOT_FOUND, CITY_LOOKUP_FAILED):
+        return None
+    if cached_value is not None:
+        return cached_value
+
+    location = await CityLocation.objects.filter(name=normalize_city_name(normalized_city)).afirst()
+    if location and location.lookup_status != CityLocation.LookupStatus.FAILED:
+        value, timeout = _city_location_cache_entry(location)
+        await cache.aset(_city_coords_cache_key(location.name), value, timeout)
+        return location.coordinates
+
+    return (await ageocode_city(normalized_city)).coordinates
+
+
+async def aget_city_coordinates(city_name: str):
+    try:
+        return await _alookup_city_coordinates(city_name)
+    except requests.RequestException:
+        return None
+
+
+async def _afetch_weather_for_coordinates(coords_list, timeout=10):
+    async def fetch():
+        response = await open_meteo_client.aget(params=_weather_params(coords_list), timeout=timeout)
+        return _parse_weather(response.json())
+
+    return await open_meteo_breaker.acall(fetch)
+
+
+async def _gather_upstream(coroutines):
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, _UPSTREAM_ERRORS):
+            raise result
+    return results
+
+
+async def _astore_weather(key: str, payload):
+    await cache.aset(_weather_cache_key(key), _weather_entry(payload), WEATHER_STALE_TIMEOUT)
+    _resolve_inflight(key, payload)
+
+
+async def _afetch_and_store_weather(cities_by_key, batch_size, coordinates_by_key=None):
+    try:
+        coords_by_key = {key: coords for key, coords in (coordinates_by_key or {}).items() if key in cities_by_key}
+        pending_keys = [key for key in cities_by_key if key not in coords_by_key]
+        geocoded = await _gather_upstream(_alookup_city_coordinates(cities_by_key[key]) for key in pending_keys)
+        for key, coords in zip(pending_keys, geocoded):
+            if isinstance(coords, BaseException):
+                continue
+            if coords:
+                coords_by_key[key] = coords
+            else:
+                await _astore_weather(key, None)
+
+        resolved_keys = list(coords_by_key)
+        batches = [resolved_keys[i:i + batch_size] for i in range(0, len(resolved_keys), batch_size)]
+        fetched = await _gather_upstream(
+            _afetch_weather_for_coordinates([coords_by_key[key] for key in batch]) for batch in batches
+        )
+        for batch, payloads in zip(batches, fetched):
+            if isinstance(payloads, BaseException):
+                continue
+            for key, payload in zip(batch, payloads):
+                await _astore_weather(key, payload)
+    finally:
+        for key in cities_by_key:
+            _resolve_inflight(key, None)
+        await cache.adelete_many([f"weather_refresh_lock:{key}" for key in cities_by_key])
+
+
+async def auncached_weather_cities(cities):
+    normalized_cities = _group_cities(cities)
+    entries = await _acached_weather_entries(normalized_cities)
+    return _missing_cities(normalized_cities, [key for key in normalized_cities if _weather_cache_key(key) not in entries])
+
+
+async def apeek_weather_for_cities(cities, coordinates=None):
+    normalized_cities = _group_cities(cities)
+    results = {city: None for city in cities}
+    if not normalized_cities:
+        return results, []
+
+    entries = await _acached_weather_entries(normalized_cities)
+    missing, stale = _apply_cached_weather(normalized_cities, entries, results)
+    if stale:
+        await sync_to_async(refresh_weather_in_background, thread_sensitive=False)(
+            stale, _coordinates_by_key(coordinates)
+        )
+    return results, _missing_cities(normalized_cities, missing)
+
+
+async def aget_weather_for_cities(cities, deadline=None, batch_size=None, coordinates=None):
+    deadline = settings.WEATHER_DEADLINE if deadline is None else deadline
+    batch_size = batch_size or settings.WEATHER_BATCH_SIZE
+    normalized_cities = _group_cities(cities)
+    coordinates_by_key = _coordinates_by_key(coordinates)
+
+    results = {city: None for city in cities}
+    if not normalized_cities:
+        return results
+
+    entries = await _acached_weather_entries(normalized_cities)
+    missing, stale = _apply_cached_weather(normalized_cities, entries, results)
+
+    if stale:
+        await sync_to_async(refresh_weather_in_background, thread_sensitive=False)(stale, coordinates_by_key)
+
+    if missing:
+        leaders, followers = _claim_inflight(missing)
+        futures = {key: asyncio.wrap_future(future) for key, future in {**leaders, **followers}.items()}
+        waiting = list(futures.values())
+        if leaders:
+            # The task keeps running past the deadline so the cache is filled for the next request.
+            task = asyncio.ensure_future(
+                _afetch_and_store_weather({key: missing[key] for key in leaders}, batch_size, coordinates_by_key)
+            )
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+            waiting.append(task)
+        await asyncio.wait(waiting, timeout=deadline)
+        for key, future in futures.items():
+            if future.done():
+                for city in normalized_cities[key]:
+                    results[city] = future.result()
+
+    return results
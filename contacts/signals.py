@@ -0,0 +1,83 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .counters import (
+    apply_counter_deltas,
+    contact_counter_keys,
+    remember_counter_keys,
+    stored_counter_keys,
+)
+from .models import Contact, ContactStatus
+from .statuses import clear_status_cache, mark_uncommitted_status_change
+from .versioning import bump_data_version
+
+_bulk_deletes = threading.local()
+
+
+@contextmanager
+def bulk_contact_delete():
+    """Skips the per-row delete receivers; the caller adjusts counters and bumps the data version once."""
+    _bulk_deletes.active = True
+    try:
+        yield
+    finally:
+        _bulk_deletes.active = False
+
+
+def _in_bulk_delete():
+    return getattr(_bulk_deletes, "active", False)
+
+
+@receiver(post_save, sender=ContactStatus)
+@receiver(post_delete, sender=ContactStatus)
+def invalidate_status_registry(sender, using=None, **kwargs):
+    # Cleared now for this transaction and again on commit, because other threads may have reloaded
+    # the registry from committed rows in between. A rollback leaves nothing behind.
+    clear_status_cache()
+    mark_uncommitted_status_change(using)
+    transaction.on_commit(clear_status_cache, using=using)
+    bump_data_version(using)
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def invalidate_contact_pages(sender, **kwargs):
+    if _in_bulk_delete():
+        return
+    bump_data_version(kwargs.get("using"))
+
+
+@receiver(pre_save, sender=Contact)
+def remember_previous_counters(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        instance._previous_counter_keys = []
+    else:
+        instance._previous_counter_keys = stored_counter_keys(instance)
+
+
+@receiver(post_save, sender=Contact)
+def update_counters_on_save(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    deltas = Counter(contact_counter_keys(instance))
+    deltas.subtract(getattr(instance, "_previous_counter_keys", []))
+    apply_counter_deltas(deltas, using=using)
+    remember_counter_keys(instance)
+
+
+@receiver(post_delete, sender=Contact)
+def update_counters_on_delete(sender, instance, using=None, **kwargs):
+    if _in_bulk_delete():
+        return
+    loaded = getattr(instance, "_loaded_values", {})
+    keys = contact_counter_keys(instance)
+    if "status_id" in loaded and "city" in loaded:
+        keys = stored_counter_keys(instance)
+    deltas = Counter()
+    deltas.subtract(keys)
+    apply_counter_deltas(deltas, using=using)
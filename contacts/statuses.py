@@ -0,0 +1,111 @@
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import ContactStatus
+
+DEFAULT_STATUS_NAMES = ["new", "in progress", "lost", "outdated"]
+DEFAULT_STATUS_NAME = "new"
+
+STATUS_NAME_MAPPING = {
+    "nowy": "new",
+    "zagubiony": "lost",
+    "w trakcie": "in progress",
+    "nieaktualny": "outdated",
+}
+
+# A miss only reloads a registry older than this, so a batch of unknown names costs one query.
+MISS_RELOAD_AFTER = 1.0
+
+_lock = threading.Lock()
+_registry = None
+# Aliases whose current transaction on this thread created or deleted statuses.
+_uncommitted = threading.local()
+
+
+class _StatusRegistry:
+    def __init__(self, statuses):
+        self.by_name = {status.name: status for status in statuses}
+        self.by_id = {status.pk: status for status in statuses}
+        self.ordered = sorted(statuses, key=lambda status: status.name)
+        self.loaded_at = time.monotonic()
+
+
+def _has_uncommitted_changes(using=DEFAULT_DB_ALIAS):
+    aliases = getattr(_uncommitted, "aliases", set())
+    if using in aliases and not transaction.get_connection(using).in_atomic_block:
+        # The transaction was rolled back; its changes are gone.
+        aliases.discard(using)
+    return using in aliases
+
+
+def mark_uncommitted_status_change(using=DEFAULT_DB_ALIAS):
+    if transaction.get_connection(using).in_atomic_block:
+        if not hasattr(_uncommitted, "aliases"):
+            _uncommitted.aliases = set()
+        _uncommitted.aliases.add(using)
+
+
+def _get_registry(reload=False):
+    global _registry
+    registry = _registry
+    if registry is None or reload:
+        with _lock:
+            registry = _StatusRegistry(list(ContactStatus.objects.all()))
+            # Rows this transaction added or removed may never commit, so other threads must not see them.
+            if not _has_uncommitted_changes():
+                _registry = registry
+    return registry
+
+
+def _reload_on_miss(registry):
+    if time.monotonic() - registry.loaded_at < MISS_RELOAD_AFTER:
+        return None
+    return _get_registry(reload=True)
+
+
+def clear_status_cache(**kwargs):
+    global _registry
+    _registry = None
+    if hasattr(_uncommitted, "aliases"):
+        _uncommitted.aliases.clear()
+
+
+def canonical_status_name(name: str):
+    name = (name or "").strip()
+    return STATUS_NAME_MAPPING.get(name.lower(), name)
+
+
+def all_statuses():
+    return _get_registry().ordered
+
+
+def get_status(name: str):
+    # A miss reloads a registry that is not fresh, so statuses created by other processes are picked up.
+    registry = _get_registry()
+    status = registry.by_name.get(name)
+    if status is None:
+        registry = _reload_on_miss(registry)
+        status = registry.by_name.get(name) if registry else None
+    return status
+
+
+def get_status_by_id(status_id):
+    registry = _get_registry()
+    status = registry.by_id.get(status_id)
+    if status is None:
+        registry = _reload_on_miss(registry)
+        status = registry.by_id.get(status_id) if registry else None
+    return status
+
+
+def get_or_create_status(name: str):
+    status = get_status(name)
+    if status is None:
+        status, _ = ContactStatus.objects.get_or_create(name=name)
+    return status
+
+
+def get_default_status():
+    return get_or_create_status(DEFAULT_STATUS_NAME)
@@ -1,13 +1,59 @@
-from django.test import TestCase
+import asyncio
+from collections import Counter
+import csv
+import datetime
+import decimal
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import skipUnless
+from unittest.mock import AsyncMock, Mock, patch
+from urllib.parse import quote
+
+import requests
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
-from .models import Contact, ContactStatus
+from config.database import database_from_url
+from . import api_views, importers, metrics, services, statuses, views
+from .cache import _MISSING, TwoTierCache
+from .counters import city_counts, rebuild_counters, status_counts
+from .forms import ContactForm
+from .http import nominatim_client
+from .importers import ContactImporter, iter_decoded_lines
+from .jobs import requeue_stale_import_jobs
+from .middleware import InstrumentationMiddleware
+from .models import CityLocation, Contact, ContactStatus, ImportJob
+from .pagination import SORT_ORDERS, _keyset_filter, encode_cursor
+from .renderers import FastJSONRenderer
+from .search import search_contacts
 from .serializers import ContactSerializer
+from .versioning import bump_data_version, get_data_version
 
 
 class ContactModelTest(TestCase):
     def setUp(self):
-        self.status = ContactStatus.objects.create(name="new")
+        self.status = ContactStatus.objects.get_or_create(name="new")[0]
 
     def test_contact_creation(self):
         contact = Contact.objects.create(
@@ -61,7 +107,7 @@ class ContactModelTest(TestCase):
 
 class ContactSerializerTest(APITestCase):
     def setUp(self):
-        self.status = ContactStatus.objects.create(name="new")
+        self.status = ContactStatus.objects.get_or_create(name="new")[0]
 
     def test_serializer_requires_phone_and_email_on_create(self):
         serializer = ContactSerializer(data={
@@ -114,10 +160,11 @@ class ContactSerializerTest(APITestCase):
         self.assertEqual(contact.email, "john.doe@example.com")
 
 
+@override_settings(CONTACTS_IMPORT_JOB_BACKEND="sync")
 class CsvImportTest(TestCase):
 
     def setUp(self):
-        self.default_status = ContactStatus.objects.create(name="new")
+        self.default_status = ContactStatus.objects.get_or_create(name="new")[0]
 
     def test_csv_import_creates_contacts(self):
         from django.test import Client
@@ -174,3 +221,1532 @@ class CsvImportTest(TestCase):
         self.assertEqual(Contact.objects.count(), 1)
         contact = Contact.objects.first()
         self.assertEqual(contact.first_name, "John")
+
+
+class ContactListPaginationTest(TestCase):
+    def setUp(self):
+        self.status = ContactStatus.objects.get_or_create(name="new")[0]
+        for index, last_name in enumerate(["Adamski", "Bielska", "Czarnecki", "Dudek", "Ellert"]):
+            Contact.objects.create(
+                first_name="Jan",
+                last_name=last_name,
+                phone_number=f"+4810000000{index}",
+                email=f"contact{index}@example.com",
+                city=f"City{index}",
+                status=self.status
+            )
+
+    def _last_names(self, response):
+        return [contact.last_name for contact in response.context["contacts"]]
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_contact_list_pages_by_last_name(self, weather_mock):
+        response = self.client.get("/", {"page_size": 2})
+        self.assertEqual(self._last_names(response), ["Adamski", "Bielska"])
+        self.assertIsNone(response.context["previous_url"])
+        self.assertEqual(sorted(weather_mock.call_args[0][0]), ["City0", "City1"])
+
+        response = self.client.get("/" + response.context["next_url"])
+        self.assertEqual(self._last_names(response), ["Czarnecki", "Dudek"])
+
+        response = self.client.get("/" + response.context["next_url"])
+        self.assertEqual(self._last_names(response), ["Ellert"])
+        self.assertIsNone(response.context["next_url"])
+
+        response = self.client.get("/" + response.context["previous_url"])
+        self.assertEqual(self._last_names(response), ["Czarnecki", "Dudek"])
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_contact_list_pages_by_created_at(self, weather_mock):
+        response = self.client.get("/", {"sort": "created_at", "page_size": 3})
+        self.assertEqual(self._last_names(response), ["Ellert", "Dudek", "Czarnecki"])
+
+        response = self.client.get("/" + response.context["next_url"])
+        self.assertEqual(self._last_names(response), ["Bielska", "Adamski"])
+        self.assertIsNone(response.context["next_url"])
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_contact_list_ignores_invalid_cursor(self, weather_mock):
+        response = self.client.get("/", {"cursor": "not-a-cursor", "page_size": 2})
+        self.assertEqual(self._last_names(response), ["Adamski", "Bielska"])
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_contact_list_ignores_cursor_with_wrong_value_types(self, weather_mock):
+        for values in (["B", "A", "abc"], ["B", "A", {"id": 1}], ["B", 1, 2], ["B", "A", True]):
+            with self.subTest(values=values):
+                response = self.client.get("/", {"cursor": encode_cursor(values), "page_size": 2})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self._last_names(response), ["Adamski", "Bielska"])
+
+
+class WeatherBatchTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        services.reset_circuit_breakers()
+        # Background fetches left over from other tests must not be joined as in-flight requests.
+        with services._inflight_lock:
+            services._inflight.clear()
+
+    def _response(self, payload):
+        response = Mock()
+        response.json.return_value = payload
+        response.raise_for_status.return_value = None
+        return response
+
+    def _fake_get(self, url, params=None, **kwargs):
+        if url == settings.NOMINATIM_URL:
+            if params["q"] == "Atlantis":
+                return self._response([])
+            return self._response([{"lat": "52.0", "lon": "21.0"}])
+        latitudes = params["latitude"].split(",")
+        return self._response([
+            {"current_weather": {"temperature": 10 + index, "windspeed": 5}, "hourly": {"relativehumidity_2m": [80]}}
+            for index, _ in enumerate(latitudes)
+        ])
+
+    def test_get_weather_for_cities_shares_one_weather_request(self):
+        CityLocation.objects.create(name="warsaw", lat=52.0, lon=21.0)
+        with patch("contacts.http.requests.Session.get", side_effect=self._fake_get) as get_mock:
+            weather = services.get_weather_for_cities(
+                ["Warsaw", "Krakow", "Atlantis"],
+                coordinates={"Krakow": {"lat": 50.0, "lon": 19.9}},
+            )
+
+        geocode_calls = [c for c in get_mock.call_args_list if c.args[0] == settings.NOMINATIM_URL]
+        weather_calls = [c for c in get_mock.call_args_list if c.args[0] == settings.OPEN_METEO_URL]
+        self.assertEqual([c.kwargs["params"]["q"] for c in geocode_calls], ["Atlantis"])
+        self.assertEqual(len(weather_calls), 1)
+        self.assertEqual(sorted(weather_calls[0].kwargs["params"]["latitude"].split(",")), ["50.0", "52.0"])
+        self.assertEqual(weather["Warsaw"]["humidity"], 80)
+        self.assertIsNotNone(weather["Krakow"])
+        self.assertIsNone(weather["Atlantis"])
+
+    def test_get_weather_for_cities_returns_partial_results_on_failure(self):
+        cache.set("weather:warsaw", {"value": {"temperature": 1, "humidity": 2, "windspeed": 3}, "fetched_at": time.time()})
+        with patch("contacts.http.requests.Session.get", side_effect=requests.ConnectionError):
+            weather = services.get_weather_for_cities(["Warsaw", "Krakow"])
+
+        self.assertEqual(weather["Warsaw"]["temperature"], 1)
+        self.assertIsNone(weather["Krakow"])
+
+    def test_stale_weather_is_served_while_refreshing_in_background(self):
+        stale_payload = {"temperature": 1, "humidity": 2, "windspeed": 3}
+        cache.set("weather:warsaw", {"value": stale_payload, "fetched_at": time.time() - 3600})
+        with patch("contacts.services.refresh_weather_in_background") as refresh_mock, \
+                patch("contacts.http.requests.Session.get") as get_mock:
+            weather = services.get_current_weather_for_city("Warsaw")
+
+        self.assertEqual(weather, stale_payload)
+        refresh_mock.assert_called_once_with(["Warsaw"], {})
+        get_mock.assert_not_called()
+
+    def test_concurrent_misses_share_one_upstream_fetch(self):
+        release = threading.Event()
+        geocode_calls = []
+
+        def slow_get(url, params=None, **kwargs):
+            if url == settings.NOMINATIM_URL:
+                geocode_calls.append(params["q"])
+                release.wait(5)
+            return self._fake_get(url, params, **kwargs)
+
+        results = []
+        with patch("contacts.http.requests.Session.get", side_effect=slow_get):
+            threads = [
+                threading.Thread(target=lambda: results.append(services.get_current_weather_for_city("Gdansk")))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.2)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(geocode_calls, ["Gdansk"])
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result and result["temperature"] == 10 for result in results))
+
+
+class CityLocationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        services.reset_circuit_breakers()
+        self.status = ContactStatus.objects.get_or_create(name="new")[0]
+
+    def test_get_city_coordinates_reads_stored_location(self):
+        CityLocation.objects.create(name="warsaw", lat=52.23, lon=21.01)
+        with patch("contacts.http.requests.Session.get") as get_mock:
+            coords = services.get_city_coordinates(" Warsaw ")
+
+        self.assertEqual(coords, {"lat": 52.23, "lon": 21.01})
+        get_mock.assert_not_called()
+
+    def test_get_city_coordinates_persists_lookup(self):
+        response = Mock()
+        response.json.return_value = [{"lat": "50.06", "lon": "19.94"}]
+        with patch("contacts.http.requests.Session.get", return_value=response):
+            services.get_city_coordinates("Krakow")
+
+        location = CityLocation.objects.get(name="krakow")
+        self.assertEqual(location.lookup_status, CityLocation.LookupStatus.RESOLVED)
+        self.assertEqual(location.coordinates, {"lat": 50.06, "lon": 19.94})
+
+    def test_unknown_city_is_negatively_cached(self):
+        response = Mock()
+        response.json.return_value = []
+        with patch("contacts.http.requests.Session.get", return_value=response) as get_mock:
+            self.assertIsNone(services.get_city_coordinates("Atlantis"))
+            self.assertIsNone(services.get_city_coordinates("atlantis "))
+
+        self.assertEqual(get_mock.call_count, 1)
+        self.assertEqual(cache.get("city_coords:atlantis"), services.CITY_NOT_FOUND)
+
+    def test_failed_lookup_returns_none_and_is_cached_briefly(self):
+        with patch("contacts.http.requests.Session.get", side_effect=requests.ConnectionError) as get_mock:
+            self.assertIsNone(services.get_city_coordinates("Krakow"))
+            self.assertIsNone(services.get_city_coordinates("Krakow"))
+
+        self.assertEqual(get_mock.call_count, 1)
+        self.assertEqual(CityLocation.objects.get(name="krakow").lookup_status, CityLocation.LookupStatus.FAILED)
+
+    @override_settings(UPSTREAM_FAILURE_THRESHOLD=2, UPSTREAM_COOLDOWN=30)
+    def test_circuit_opens_after_repeated_failures(self):
+        with patch("contacts.http.requests.Session.get", side_effect=requests.Timeout) as get_mock:
+            for city in ["Gdansk", "Poznan", "Lodz", "Lublin"]:
+                self.assertIsNone(services.get_city_coordinates(city))
+        self.assertEqual(get_mock.call_count, 2)
+        self.assertFalse(CityLocation.objects.filter(name__in=["lodz", "lublin"]).exists())
+
+        response = Mock()
+        response.json.return_value = [{"lat": "51.25", "lon": "22.57"}]
+        with patch("contacts.services.time.monotonic", return_value=time.monotonic() + 31), \
+                patch("contacts.http.requests.Session.get", return_value=response) as get_mock:
+            self.assertEqual(services.get_city_coordinates("Lublin"), {"lat": 51.25, "lon": 22.57})
+        get_mock.assert_called_once()
+        self.assertTrue(services.nominatim_breaker.allow())
+
+    def test_geocode_cities_command_backfills_and_links_contacts(self):
+        contact = Contact.objects.create(
+            first_name="Jan",
+            last_name="Nowak",
+            phone_number="+48123123123",
+            email="jan.nowak@example.com",
+            city="Gdańsk",
+            status=self.status
+        )
+        response = Mock()
+        response.json.return_value = [{"lat": "54.35", "lon": "18.65"}]
+        with patch("contacts.http.requests.Session.get", return_value=response) as get_mock:
+            call_command("geocode_cities", delay=0, stdout=io.StringIO())
+            call_command("geocode_cities", delay=0, stdout=io.StringIO())
+
+        self.assertEqual(get_mock.call_count, 1)
+        contact.refresh_from_db()
+        self.assertEqual(contact.location.name, "gdańsk")
+
+    def test_save_looks_up_location_only_when_city_changes(self):
+        gdansk = CityLocation.objects.create(name="gdańsk", lat=54.35, lon=18.65)
+        sopot = CityLocation.objects.create(name="sopot", lat=54.44, lon=18.56)
+        Contact.objects.create(
+            first_name="Jan",
+            last_name="Nowak",
+            phone_number="+48123123123",
+            email="jan.nowak@example.com",
+            city="Gdańsk",
+            status=self.status
+        )
+        contact = Contact.objects.get(email="jan.nowak@example.com")
+        self.assertEqual(contact.location_id, gdansk.pk)
+
+        contact.first_name = "Janek"
+        with CaptureQueriesContext(connection) as queries:
+            contact.save()
+        self.assertFalse([query for query in queries if "contacts_citylocation" in query["sql"]])
+
+        contact.city = "Sopot"
+        contact.save()
+        self.assertEqual(Contact.objects.get(pk=contact.pk).location_id, sopot.pk)
+
+
+class ContactImporterTest(TestCase):
+    def setUp(self):
+        self.status = ContactStatus.objects.get_or_create(name="new")[0]
+        Contact.objects.create(
+            first_name="Existing",
+            last_name="Contact",
+            phone_number="+48500000000",
+            email="existing@example.com",
+            city="Warsaw",
+            status=self.status
+        )
+
+    def _row(self, index, **overrides):
+        row = {
+            "first_name": "Jan",
+            "last_name": f"Kowalski{index}",
+            "phone_number": f"+48600000{index:03d}",
+            "email": f"jan{index}@example.com",
+            "city": "Warsaw",
+            "status": "nowy",
+        }
+        row.update(overrides)
+        return row
+
+    def test_import_reports_skipped_rows_with_reasons(self):
+        rows = [
+            self._row(1),
+            self._row(2, phone_number="+48600000001"),
+            self._row(3, email="existing@example.com"),
+            self._row(4, city=""),
+            self._row(5, status="w trakcie"),
+        ]
+        result = ContactImporter(batch_size=2).run(rows)
+
+        self.assertEqual(result.created_count, 2)
+        self.assertEqual(result.skipped_count, 3)
+        self.assertEqual(result.errors, [
+            (3, "duplicate phone_number in file"),
+            (4, "email already exists"),
+            (5, "missing required fields"),
+        ])
+        self.assertEqual(Contact.objects.get(email="jan5@example.com").status.name, "in progress")
+
+    def test_import_keeps_per_batch_state_and_a_bounded_error_list(self):
+        rows = [self._row(1), self._row(2), self._row(3, email="jan1@example.com")]
+        rows += [self._row(index, city="") for index in range(10, 200)]
+
+        result = ContactImporter(batch_size=2).run(rows)
+
+        self.assertEqual(result.created_count, 2)
+        self.assertEqual(result.skipped_count, 191)
+        self.assertEqual(result.errors[0], (4, "email already exists"))
+        self.assertEqual(len(result.errors), importers.MAX_STORED_ERRORS)
+        self.assertEqual(result.errors[-1][0], 103)
+
+    def test_import_query_count_does_not_grow_with_rows(self):
+        ContactStatus.objects.get_or_create(name="lost")[0]
+        with CaptureQueriesContext(connection) as small_import:
+            ContactImporter(batch_size=500).run([self._row(index, status="zagubiony") for index in range(10)])
+        with CaptureQueriesContext(connection) as large_import:
+            result = ContactImporter(batch_size=500).run(
+                [self._row(index, status="zagubiony") for index in range(10, 100)]
+            )
+
+        self.assertEqual(result.created_count, 90)
+        self.assertEqual(len(small_import.captured_queries), len(large_import.captured_queries))
+
+
+class CsvStreamingTest(TestCase):
+    def test_iter_decoded_lines_handles_bom_and_split_characters(self):
+        data = "\ufefffirst_name,city\nŁukasz,Łódź\r\nAnna,\"Kraków\nCentrum\"\n".encode("utf-8")
+        chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+
+        rows = list(csv.DictReader(iter_decoded_lines(chunks)))
+
+        self.assertEqual(rows, [
+            {"first_name": "Łukasz", "city": "Łódź"},
+            {"first_name": "Anna", "city": "Kraków\nCentrum"},
+        ])
+
+    def test_iter_decoded_lines_rejects_overlong_lines(self):
+        lines = iter_decoded_lines([b"a,b\n", b"x" * 40, b"x" * 40, b"\n"], max_line_length=64)
+
+        self.assertEqual(next(lines), "a,b\n")
+        with self.assertRaisesMessage(csv.Error, "longer than 64 characters"):
+            next(lines)
+
+    def test_iter_decoded_lines_yields_unterminated_last_line(self):
+        chunks = [b"a,b\nc", b",d"]
+
+        self.assertEqual(list(iter_decoded_lines(chunks, max_line_length=8)), ["a,b\n", "c,d"])
+
+    @override_settings(CONTACTS_IMPORT_MAX_UPLOAD_SIZE=10)
+    def test_import_rejects_files_over_the_upload_limit(self):
+        csv_file = SimpleUploadedFile("test.csv", b"first_name,last_name\nJohn,Doe\n", content_type="text/csv")
+
+        response = self.client.post("/import/", {"file": csv_file})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("too large", response.context["form"].errors["file"][0])
+
+
+@override_settings(MEDIA_ROOT=tempfile.gettempdir())
+class ImportJobTest(TestCase):
+    csv_content = (
+        "first_name,last_name,phone_number,email,city,status\n"
+        "John,Doe,+48123456789,john.doe@example.com,Warsaw,new\n"
+        "Jane,,+48987654321,jane@example.com,Warsaw,new\n"
+    )
+
+    def _upload(self):
+        return SimpleUploadedFile("contacts.csv", self.csv_content.encode("utf-8"), content_type="text/csv")
+
+    @override_settings(CONTACTS_IMPORT_JOB_BACKEND="queue")
+    def test_queued_job_is_processed_by_command_and_reports_progress(self):
+        response = self.client.post("/import/", {"file": self._upload()})
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, f"/import/{job.id}/")
+        self.assertEqual(job.status, ImportJob.Status.PENDING)
+        self.assertEqual(Contact.objects.count(), 0)
+
+        call_command("process_import_jobs", stdout=io.StringIO())
+
+        response = self.client.get(f"/api/import-jobs/{job.id}/")
+        data = response.json()
+        self.assertEqual(data["status"], "completed")
+        self.assertEqual(data["rows_processed"], 2)
+        self.assertEqual(data["created_count"], 1)
+        self.assertEqual(data["skipped_count"], 1)
+        self.assertEqual(data["errors"], [{"row": 3, "reason": "missing required fields"}])
+        self.assertTrue(data["is_finished"])
+        self.assertEqual(Contact.objects.count(), 1)
+
+    @override_settings(CONTACTS_IMPORT_JOB_BACKEND="sync")
+    def test_job_with_invalid_encoding_fails(self):
+        upload = SimpleUploadedFile("contacts.csv", "first_name\nŁukasz\n".encode("utf-16"), content_type="text/csv")
+
+        self.client.post("/import/", {"file": upload})
+
+        job = ImportJob.objects.get()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+        self.assertEqual(job.error_message, "The file must be UTF-8 encoded.")
+        self.assertFalse(job.file)
+
+    @override_settings(CONTACTS_IMPORT_JOB_BACKEND="queue", CONTACTS_IMPORT_JOB_MAX_ATTEMPTS=2)
+    def test_stale_running_job_is_requeued_then_failed(self):
+        self.client.post("/import/", {"file": self._upload()})
+        job = ImportJob.objects.get()
+        stale_at = timezone.now() - datetime.timedelta(seconds=settings.CONTACTS_IMPORT_JOB_STALE_AFTER + 1)
+        # A worker that died right after claiming the job.
+        ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.Status.RUNNING, heartbeat_at=stale_at, attempts=1)
+
+        call_command("process_import_jobs", stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.COMPLETED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(Contact.objects.count(), 1)
+
+        ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.Status.RUNNING, heartbeat_at=stale_at)
+        with self.assertLogs("contacts.jobs", "WARNING") as logs:
+            self.assertEqual(requeue_stale_import_jobs(), 0)
+        self.assertEqual(logs.output, [f"WARNING:contacts.jobs:Import job {job.pk} stopped responding 2 times, giving up"])
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+        self.assertEqual(job.error_message, "The import worker stopped responding.")
+
+
+class ContactSearchTest(TestCase):
+    def setUp(self):
+        status = ContactStatus.objects.get_or_create(name="new")[0]
+        self.weronika = Contact.objects.create(
+            first_name="Weronika",
+            last_name="Szymański",
+            phone_number="+48946375202",
+            email="weronika.szymanski1@example.pl",
+            city="Poznań",
+            status=status
+        )
+        self.pawel = Contact.objects.create(
+            first_name="Paweł",
+            last_name="Grabowski",
+            phone_number="+48601106656",
+            email="pawel.grabowski2@example.pl",
+            city="Łódź",
+            status=status
+        )
+
+    def _search(self, query):
+        return list(search_contacts(Contact.objects.order_by("id"), query))
+
+    def test_search_matches_name_prefix(self):
+        self.assertEqual(self._search("Szym"), [self.weronika])
+
+    def test_search_matches_partial_phone_number(self):
+        self.assertEqual(self._search("106 656"), [self.pawel])
+
+    def test_search_folds_polish_diacritics(self):
+        self.assertEqual(self._search("pawel lodz"), [self.pawel])
+        self.assertEqual(self._search("Szymański Poznań"), [self.weronika])
+
+    def test_search_requires_every_term_to_match(self):
+        self.assertEqual(self._search("pawel poznan"), [])
+
+    def test_search_vector_follows_updates(self):
+        self.pawel.city = "Gdańsk"
+        self.pawel.save()
+        self.assertEqual(self._search("gdansk"), [self.pawel])
+        self.assertEqual(self._search("lodz"), [])
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_contact_list_uses_search_index(self, weather_mock):
+        response = self.client.get("/", {"q": "grab"})
+        self.assertEqual(list(response.context["contacts"]), [self.pawel])
+
+
+@skipUnless(connection.vendor == "sqlite", "Query plans are checked against SQLite's EXPLAIN QUERY PLAN output.")
+class ContactQueryPlanTest(TestCase):
+    def setUp(self):
+        self.status = ContactStatus.objects.get_or_create(name="new")[0]
+        for index in range(20):
+            Contact.objects.create(
+                first_name=f"Jan{index}",
+                last_name=f"Nowak{index % 5}",
+                phone_number=f"+48700000{index:03d}",
+                email=f"nowak{index}@example.com",
+                city="Warsaw" if index % 2 else "Krakow",
+                status=self.status
+            )
+
+    def assertUsesIndexWithoutSort(self, queryset, index_name=None):
+        plan = queryset.explain()
+        self.assertNotIn("TEMP B-TREE", plan)
+        contact_steps = [line for line in plan.splitlines() if re.search(r"(SCAN|SEARCH) contacts_contact\b", line)]
+        self.assertEqual(len(contact_steps), 1, plan)
+        if index_name:
+            self.assertIn(f"INDEX {index_name}", contact_steps[0])
+
+    def test_contact_list_sort_orders_use_indexes(self):
+        queryset = Contact.objects.select_related("status", "location").defer("search_vector")
+        index_names = {"last_name": "contact_name_order_idx", "created_at": "contact_created_order_idx"}
+        for sort_key, fields in SORT_ORDERS.items():
+            with self.subTest(sort_key=sort_key):
+                self.assertUsesIndexWithoutSort(queryset.order_by(*fields)[:51], index_names[sort_key])
+
+        last = Contact.objects.order_by(*SORT_ORDERS["last_name"]).first()
+        page_filter = _keyset_filter(SORT_ORDERS["last_name"], [last.last_name, last.first_name, last.id])
+        self.assertUsesIndexWithoutSort(
+            queryset.filter(page_filter).order_by(*SORT_ORDERS["last_name"])[:51], "contact_name_order_idx"
+        )
+
+    def test_api_list_uses_primary_key_order(self):
+        self.assertUsesIndexWithoutSort(Contact.objects.select_related("status").order_by("id")[:50])
+
+    def test_status_and_city_filters_use_indexes(self):
+        self.assertUsesIndexWithoutSort(
+            Contact.objects.filter(status=self.status).order_by("last_name")[:50], "contact_status_last_name_idx"
+        )
+        self.assertUsesIndexWithoutSort(Contact.objects.filter(city="Warsaw").order_by("id"), "contact_city_idx")
+
+
+class ContactApiListTest(APITestCase):
+    def setUp(self):
+        self.new_status = ContactStatus.objects.get_or_create(name="new")[0]
+        self.lost_status = ContactStatus.objects.get_or_create(name="lost")[0]
+        for index in range(5):
+            Contact.objects.create(
+                first_name=f"Anna{index}",
+                last_name="Nowak",
+                phone_number=f"+48800000{index:03d}",
+                email=f"anna{index}@example.com",
+                city="Warsaw" if index < 3 else "Krakow",
+                status=self.new_status if index % 2 == 0 else self.lost_status
+            )
+
+    def test_list_is_cursor_paginated(self):
+        response = self.client.get("/api/contacts/", {"page_size": 2})
+        first_names = [item["first_name"] for item in response.json()["results"]]
+        self.assertEqual(first_names, ["Anna0", "Anna1"])
+
+        seen = list(first_names)
+        next_url = response.json()["next"]
+        while next_url:
+            data = self.client.get(next_url).json()
+            seen += [item["first_name"] for item in data["results"]]
+            next_url = data["next"]
+        self.assertEqual(seen, [f"Anna{index}" for index in range(5)])
+
+    @override_settings(CONTACTS_API_PAGE_SIZE=3, CONTACTS_MAX_PAGE_SIZE=4)
+    def test_list_page_size_follows_settings(self):
+        self.assertEqual(len(self.client.get("/api/contacts/").json()["results"]), 3)
+        self.assertEqual(len(self.client.get("/api/contacts/", {"page_size": 50}).json()["results"]), 4)
+
+    def test_list_filters_by_status_and_city(self):
+        response = self.client.get("/api/contacts/", {"status": "new", "city": "Warsaw"})
+        self.assertEqual([item["first_name"] for item in response.json()["results"]], ["Anna0", "Anna2"])
+
+    def test_list_filters_by_created_range(self):
+        Contact.objects.filter(first_name="Anna0").update(
+            created_at=datetime.datetime(2020, 1, 1, 12, tzinfo=datetime.timezone.utc)
+        )
+        response = self.client.get("/api/contacts/", {"created_before": "2020-01-01"})
+        self.assertEqual([item["first_name"] for item in response.json()["results"]], ["Anna0"])
+
+        response = self.client.get("/api/contacts/", {"created_after": "not-a-date"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_returns_sparse_fieldsets(self):
+        response = self.client.get("/api/contacts/", {"fields": "id,city"})
+        self.assertEqual(set(response.json()["results"][0]), {"id", "city"})
+
+    def test_fast_read_path_matches_serializer(self):
+        contacts = list(Contact.objects.order_by("id"))
+        expected = ContactSerializer(contacts, many=True).data
+
+        response = self.client.get("/api/contacts/", {"page_size": 10})
+        self.assertEqual(response.content, FastJSONRenderer().render({
+            "next": None, "previous": None, "results": expected,
+        }))
+        self.assertEqual(response.json()["results"], json.loads(JSONRenderer().render(expected)))
+        self.assertNotIn("email", response.json()["results"][0])
+
+        response = self.client.get(f"/api/contacts/{contacts[1].pk}/")
+        self.assertEqual(response.content, JSONRenderer().render(ContactSerializer(contacts[1]).data))
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            "city": "Łódź \u2028",
+            "created_at": datetime.datetime(2024, 5, 1, 10, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            "score": decimal.Decimal("1.50"),
+            "items": [1, None, True],
+        }
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_list_is_gzipped_when_accepted(self):
+        response = self.client.get("/api/contacts/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))["results"]), 5)
+
+
+class ContactBulkApiTest(APITestCase):
+    def setUp(self):
+        self.status = ContactStatus.objects.get_or_create(name="new")[0]
+        ContactStatus.objects.get_or_create(name="lost")[0]
+        self.existing = Contact.objects.create(
+            first_name="Ewa",
+            last_name="Lis",
+            phone_number="+48900000001",
+            email="ewa.lis@example.com",
+            city="Warsaw",
+            status=self.status
+        )
+
+    def _create(self, index, **overrides):
+        item = {
+            "op": "create",
+            "first_name": "Adam",
+            "last_name": f"Nowak{index}",
+            "phone_number": f"+48910000{index:03d}",
+            "email": f"adam{index}@example.com",
+            "city": "Gdańsk",
+            "status": "new",
+        }
+        item.update(overrides)
+        return item
+
+    def _deletes(self, indexes):
+        return [{"op": "delete", "email": f"adam{index}@example.com"} for index in indexes]
+
+    def test_bulk_applies_creates_upserts_and_deletes(self):
+        doomed = Contact.objects.create(
+            first_name="Olga",
+            last_name="Kot",
+            phone_number="+48900000002",
+            email="olga.kot@example.com",
+            city="Warsaw",
+            status=self.status
+        )
+        payload = [
+            self._create(1),
+            {"op": "upsert", "email": "ewa.lis@example.com", "city": "Kraków", "status": "lost"},
+            {"op": "upsert", **{k: v for k, v in self._create(2).items() if k != "op"}},
+            {"op": "delete", "phone_number": "+48900000002"},
+            {"op": "delete", "id": 999999},
+            self._create(3, email="ewa.lis@example.com"),
+            self._create(4, status="unknown"),
+            {"op": "rename"},
+        ]
+
+        response = self.client.post("/api/contacts/bulk/", payload, format="json")
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["status"] for result in data["results"]], [
+            "created", "updated", "created", "deleted", "not_found", "error", "error", "error",
+        ])
+        self.assertEqual((data["created"], data["updated"], data["deleted"], data["error"]), (2, 1, 1, 3))
+        self.assertIn("email", data["results"][5]["errors"])
+        self.assertIn("status", data["results"][6]["errors"])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.city, self.existing.status.name), ("Kraków", "lost"))
+        self.assertEqual(list(search_contacts(Contact.objects.all(), "krakow")), [self.existing])
+        self.assertFalse(Contact.objects.filter(pk=doomed.pk).exists())
+        self.assertTrue(Contact.objects.filter(pk=data["results"][0]["id"], email="adam1@example.com").exists())
+
+    def test_bulk_applies_items_in_order_around_deletes(self):
+        recreated = {k: v for k, v in self._create(1).items() if k != "op"}
+        recreated.update({"email": "ewa.lis@example.com", "phone_number": "+48900000001"})
+        payload = [
+            {"op": "delete", "email": "ewa.lis@example.com"},
+            {"op": "create", **recreated},
+            {"op": "delete", "email": "ewa.lis@example.com"},
+        ]
+
+        data = self.client.post("/api/contacts/bulk/", payload, format="json").json()
+
+        self.assertEqual([result["status"] for result in data["results"]], ["deleted", "created", "not_found"])
+        self.assertFalse(Contact.objects.filter(pk=self.existing.pk).exists())
+        self.assertEqual(Contact.objects.get(email="ewa.lis@example.com").last_name, "Nowak1")
+
+    def test_bulk_query_count_does_not_grow_with_items(self):
+        with CaptureQueriesContext(connection) as small_request:
+            self.client.post("/api/contacts/bulk/", [self._create(index) for index in range(5)], format="json")
+        with CaptureQueriesContext(connection) as large_request:
+            response = self.client.post(
+                "/api/contacts/bulk/", [self._create(index) for index in range(5, 60)], format="json"
+            )
+
+        self.assertEqual(response.json()["created"], 55)
+        self.assertEqual(len(small_request.captured_queries), len(large_request.captured_queries))
+
+        with CaptureQueriesContext(connection) as small_delete:
+            self.client.post("/api/contacts/bulk/", self._deletes(range(5)), format="json")
+        with CaptureQueriesContext(connection) as large_delete:
+            response = self.client.post("/api/contacts/bulk/", self._deletes(range(5, 60)), format="json")
+
+        self.assertEqual(response.json()["deleted"], 55)
+        self.assertEqual(len(small_delete.captured_queries), len(large_delete.captured_queries))
+
+    def test_bulk_accepts_ndjson(self):
+        body = "\n".join(json.dumps(self._create(index)) for index in range(3))
+
+        response = self.client.post("/api/contacts/bulk/", body, content_type="application/x-ndjson")
+
+        self.assertEqual(response.json()["created"], 3)
+
+
+class ContactExportTest(TestCase):
+    def setUp(self):
+        status = ContactStatus.objects.get_or_create(name="new")[0]
+        for index in range(3):
+            Contact.objects.create(
+                first_name="Łucja",
+                last_name=f"Wiśniewska{index}",
+                phone_number=f"+48700000{index:03d}",
+                email=f"lucja{index}@example.com",
+                city="Kraków",
+                status=status
+            )
+
+    def test_csv_export_streams_import_format(self):
+        response = self.client.get("/export/")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode("utf-8"))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0], {
+            "first_name": "Łucja",
+            "last_name": "Wiśniewska0",
+            "phone_number": "+48700000000",
+            "email": "lucja0@example.com",
+            "city": "Kraków",
+            "status": "new",
+        })
+
+    def test_exported_csv_round_trips_through_import(self):
+        exported = b"".join(self.client.get("/export/").streaming_content).decode("utf-8")
+        Contact.objects.all().delete()
+
+        result = ContactImporter().run(csv.DictReader(io.StringIO(exported)))
+
+        self.assertEqual(result.created_count, 3)
+        self.assertEqual(Contact.objects.filter(city="Kraków", status__name="new").count(), 3)
+
+    def test_ndjson_export_honours_search(self):
+        response = self.client.get("/export/", {"format": "ndjson", "q": "wisniewska1"})
+
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["email"] for line in lines], ["lucja1@example.com"])
+
+    def test_export_command_writes_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as output:
+            call_command("export_contacts", "--output", output.name, "--chunk-size", "2")
+            with open(output.name, encoding="utf-8") as exported:
+                self.assertEqual(len(exported.read().splitlines()), 4)
+
+
+class StatusRegistryTest(TestCase):
+    def setUp(self):
+        statuses.clear_status_cache()
+
+    def test_default_statuses_are_seeded_by_migration(self):
+        self.assertTrue(set(statuses.DEFAULT_STATUS_NAMES) <= set(ContactStatus.objects.values_list("name", flat=True)))
+
+    def test_form_and_serializer_read_statuses_without_queries(self):
+        statuses.all_statuses()
+        new_status = statuses.get_status("new")
+
+        with self.assertNumQueries(0):
+            form = ContactForm()
+            rendered = str(form["status"])
+            cleaned = form.fields["status"].clean(str(new_status.pk))
+            lost = ContactSerializer().fields["status"].to_internal_value("lost")
+
+        self.assertIn(">in progress</option>", rendered)
+        self.assertEqual((cleaned, lost.name), (new_status, "lost"))
+
+    def test_registry_is_invalidated_on_save_and_delete(self):
+        self.assertIsNone(statuses.get_status("vip"))
+
+        vip = ContactStatus.objects.create(name="vip")
+        self.assertEqual(statuses.get_status("vip"), vip)
+        self.assertIn(vip, statuses.all_statuses())
+
+        vip.delete()
+        self.assertNotIn("vip", [status.name for status in statuses.all_statuses()])
+
+    def test_unknown_names_reload_the_registry_at_most_once(self):
+        statuses.all_statuses()
+        with self.assertNumQueries(0):
+            self.assertIsNone(statuses.get_status("unknown0"))
+
+        statuses._registry.loaded_at -= statuses.MISS_RELOAD_AFTER
+        with self.assertNumQueries(1):
+            for index in range(20):
+                self.assertIsNone(statuses.get_status(f"unknown{index}"))
+
+
+class StatusRegistryRollbackTest(TransactionTestCase):
+    def setUp(self):
+        statuses.clear_status_cache()
+
+    def test_status_from_rolled_back_transaction_is_not_kept(self):
+        statuses.all_statuses()
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            vip = statuses.get_or_create_status("vip")
+            self.assertEqual(statuses.get_status("vip"), vip)
+            self.assertIn(vip, statuses.all_statuses())
+            raise RuntimeError("import failed")
+
+        self.assertIsNone(statuses.get_status("vip"))
+        self.assertNotIn("vip", [status.name for status in statuses.all_statuses()])
+        contact = Contact.objects.create(
+            first_name="Jan",
+            last_name="Nowak",
+            phone_number="+48123123123",
+            email="jan.nowak@example.com",
+            city="Gdańsk",
+            status=statuses.get_or_create_status("vip"),
+        )
+        self.assertEqual(contact.status.name, "vip")
+
+
+class TwoTierCacheTest(TestCase):
+    def setUp(self):
+        self.shared_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.shared_dir.cleanup)
+        caches_setting = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "shared": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": self.shared_dir.name,
+            },
+        }
+        override = override_settings(CACHES=caches_setting)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _worker_cache(self, **options):
+        return TwoTierCache("", {"OPTIONS": {"SHARED_ALIAS": "shared", **options}})
+
+    def test_workers_share_values_through_the_shared_tier(self):
+        first_worker = self._worker_cache()
+        second_worker = self._worker_cache()
+
+        first_worker.set("weather:warsaw", {"temp": 12}, 600)
+
+        self.assertEqual(second_worker.get("weather:warsaw"), {"temp": 12})
+        self.assertFalse(second_worker.add("weather:warsaw", {"temp": 99}))
+
+    def test_data_version_bumps_are_seen_by_other_workers_at_once(self):
+        first_worker = self._worker_cache()
+        second_worker = self._worker_cache()
+        with patch("contacts.versioning.cache", first_worker):
+            version = get_data_version()
+
+        with patch("contacts.versioning.cache", second_worker):
+            bump_data_version()
+            bumped = get_data_version()
+
+        self.assertNotEqual(bumped, version)
+        with patch("contacts.versioning.cache", first_worker):
+            self.assertEqual(get_data_version(), bumped)
+
+    def test_hot_keys_are_served_from_the_local_tier(self):
+        worker = self._worker_cache()
+        worker.set("weather:warsaw", {"temp": 12}, 600)
+
+        with patch.object(worker.shared, "get", side_effect=AssertionError("shared tier was hit")):
+            self.assertEqual(worker.get("weather:warsaw"), {"temp": 12})
+            self.assertEqual(worker.get_many(["weather:warsaw"]), {"weather:warsaw": {"temp": 12}})
+
+    def test_local_tier_is_bounded_lru(self):
+        worker = self._worker_cache(LOCAL_MAX_ENTRIES=2)
+        worker.set("a", 1)
+        worker.set("b", 2)
+        worker.get("a")
+        worker.set("c", 3)
+
+        self.assertEqual(list(worker._local), [worker.make_key("a"), worker.make_key("c")])
+        self.assertEqual(worker.get("b"), 2)
+
+    def test_local_entries_expire_with_the_shorter_ttl(self):
+        worker = self._worker_cache(LOCAL_TIMEOUT=30)
+        worker.set("short", "value", 5)
+        worker.set("long", "value", 600)
+
+        with patch("contacts.cache.time.monotonic", return_value=time.monotonic() + 10):
+            self.assertIs(worker._local_get(worker.make_key("short")), _MISSING)
+            self.assertEqual(worker._local_get(worker.make_key("long")), "value")
+
+    def test_delete_clears_both_tiers(self):
+        first_worker = self._worker_cache()
+        second_worker = self._worker_cache()
+        first_worker.set("lock", 1)
+
+        first_worker.delete("lock")
+
+        self.assertIsNone(first_worker.get("lock"))
+        self.assertIsNone(second_worker.get("lock"))
+
+
+class _StubUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = json.dumps([{"lat": "52.0", "lon": "21.0"}]).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UpstreamClientTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        services.reset_circuit_breakers()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubUpstreamHandler)
+        self.server.connections = 0
+        self.server.paths = []
+        self.server.statuses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        stub_url = f"http://127.0.0.1:{self.server.server_port}/search"
+        override = override_settings(NOMINATIM_URL=stub_url, UPSTREAM_RETRY_BACKOFF=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        nominatim_client.close()
+        self.addCleanup(nominatim_client.close)
+
+    def test_requests_reuse_one_keep_alive_connection(self):
+        for city in ["Warsaw", "Krakow", "Gdansk"]:
+            self.assertEqual(services.get_city_coordinates(city), {"lat": 52.0, "lon": 21.0})
+
+        stats = nominatim_client.stats()
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual((stats["requests"], stats["failures"], stats["connections_opened"]), (3, 0, 1))
+        self.assertIsNotNone(stats["avg_latency_ms"])
+
+    def test_transient_errors_are_retried(self):
+        self.server.statuses = [503]
+
+        self.assertEqual(services.get_city_coordinates("Warsaw"), {"lat": 52.0, "lon": 21.0})
+
+        self.assertEqual(len(self.server.paths), 2)
+        self.assertEqual(nominatim_client.stats()["requests"], 1)
+
+    @override_settings(UPSTREAM_RETRIES=1)
+    def test_persistent_errors_surface_after_retries(self):
+        self.server.statuses = [500, 500]
+
+        with self.assertRaises(requests.HTTPError):
+            nominatim_client.get(params={"q": "Warsaw"})
+
+        self.assertEqual(len(self.server.paths), 2)
+        self.assertEqual(nominatim_client.stats()["failures"], 1)
+
+
+class AsyncContactListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        services.reset_circuit_breakers()
+        status = ContactStatus.objects.get_or_create(name="new")[0]
+        for index, (last_name, city) in enumerate([("Adamski", "Warsaw"), ("Bielska", "Krakow"), ("Czarnecki", "Gdansk")]):
+            Contact.objects.create(
+                first_name="Jan",
+                last_name=last_name,
+                phone_number=f"+4820000000{index}",
+                email=f"async{index}@example.com",
+                city=city,
+                status=status
+            )
+
+    def _slow_get(self, url, params=None, **kwargs):
+        response = Mock()
+        if url == settings.NOMINATIM_URL:
+            # Each geocoding call waits for the other two, so the calls only finish if they run concurrently.
+            self.geocode_barrier.wait()
+            response.json.return_value = [{"lat": "52.0", "lon": "21.0"}]
+        else:
+            response.json.return_value = [
+                {"current_weather": {"temperature": 7, "windspeed": 3}, "hourly": {"relativehumidity_2m": [70]}}
+                for _ in params["latitude"].split(",")
+            ]
+        return response
+
+    async def test_async_list_matches_sync_pagination(self):
+        request = AsyncRequestFactory().get("/", {"page_size": 2})
+        with patch("contacts.views.apeek_weather_for_cities", new=AsyncMock(return_value=({}, []))) as weather_mock:
+            response = await views.contact_list_async(request)
+
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn("Adamski", content)
+        self.assertIn("Bielska", content)
+        self.assertNotIn("Czarnecki", content)
+        self.assertEqual(sorted(weather_mock.call_args.args[0]), ["Krakow", "Warsaw"])
+
+    async def test_async_weather_fetches_cities_concurrently(self):
+        self.geocode_barrier = threading.Barrier(3, timeout=10)
+        with patch("contacts.http.requests.Session.get", side_effect=self._slow_get) as get_mock:
+            first, second = await asyncio.gather(
+                services.aget_weather_for_cities(["Warsaw", "Krakow", "Gdansk"]),
+                services.aget_weather_for_cities(["Warsaw"]),
+            )
+
+        geocode_calls = [c for c in get_mock.call_args_list if c.args[0] == settings.NOMINATIM_URL]
+        self.assertEqual(len(geocode_calls), 3)
+        self.assertFalse(self.geocode_barrier.broken)
+        self.assertEqual({city: weather["temperature"] for city, weather in first.items()}, {
+            "Warsaw": 7, "Krakow": 7, "Gdansk": 7,
+        })
+        self.assertEqual(second["Warsaw"]["humidity"], 70)
+        self.assertTrue(await CityLocation.objects.filter(name="gdansk").aexists())
+
+
+class WeatherApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        services.reset_circuit_breakers()
+        CityLocation.objects.create(name="warsaw", lat=52.0, lon=21.0)
+
+    def test_endpoint_returns_weather_for_many_cities_with_cache_headers(self):
+        payload = {"temperature": 3, "humidity": 90, "windspeed": 12}
+
+        def fake_fetch(cities_by_key, batch_size, coordinates_by_key=None):
+            self.assertEqual(coordinates_by_key, {"warsaw": {"lat": 52.0, "lon": 21.0}})
+            for key in cities_by_key:
+                services._store_weather(key, payload if key == "warsaw" else None)
+                services._resolve_inflight(key, payload if key == "warsaw" else None)
+
+        with patch("contacts.services._get_executor") as executor_mock:
+            executor_mock.return_value.submit.side_effect = lambda func, *args: func(*args)
+            with patch("contacts.services._fetch_and_store_weather", side_effect=fake_fetch):
+                response = self.client.get("/api/weather/", {"city": ["Warsaw", " Atlantis", "Warsaw"]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"results": {"Warsaw": payload, "Atlantis": None}, "pending": []})
+        self.assertIn("max-age=300", response["Cache-Control"])
+
+    def test_unresolved_cities_are_reported_as_pending_and_not_cached(self):
+        with patch("contacts.services._start_fetch", return_value={}):
+            response = self.client.get("/api/weather/", {"city": ["Krakow", "Warszawa, Mokotów"]})
+
+        self.assertEqual(response.json()["pending"], ["Krakow", "Warszawa, Mokotów"])
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    async def test_async_endpoint_matches_sync_response(self):
+        await cache.aset("weather:warsaw", {"value": {"temperature": 1, "humidity": 2, "windspeed": 3}, "fetched_at": time.time()})
+        request = AsyncRequestFactory().get("/api/weather/", {"city": "Warsaw"})
+
+        response = await api_views.weather_api_async(request)
+
+        self.assertEqual(json.loads(response.content), {
+            "results": {"Warsaw": {"temperature": 1, "humidity": 2, "windspeed": 3}}, "pending": [],
+        })
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_too_many_cities_are_rejected(self):
+        cities = [f"City{index}" for index in range(settings.CONTACTS_MAX_PAGE_SIZE + 1)]
+        response = self.client.get("/api/weather/", {"city": cities})
+        self.assertEqual(response.status_code, 400)
+
+    def test_contact_list_renders_without_calling_upstream(self):
+        status = ContactStatus.objects.get_or_create(name="new")[0]
+        for index, city in enumerate(["Warsaw", "Krakow"]):
+            Contact.objects.create(
+                first_name="Jan",
+                last_name=f"Lazy{index}",
+                phone_number=f"+4830000000{index}",
+                email=f"lazy{index}@example.com",
+                city=city,
+                status=status
+            )
+        cache.set("weather:warsaw", {"value": {"temperature": 5, "humidity": 60, "windspeed": 4}, "fetched_at": time.time()})
+
+        with patch("contacts.http.requests.Session.get") as get_mock:
+            response = self.client.get("/")
+
+        get_mock.assert_not_called()
+        content = response.content.decode()
+        self.assertIn("Temp: 5°C", content)
+        self.assertIn('data-weather-city="Krakow"', content)
+        self.assertNotIn('data-weather-city="Warsaw"', content)
+        self.assertEqual(response.context["weather_pending"], {"Krakow"})
+
+
+class ContactListConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.status = ContactStatus.objects.get_or_create(name="new")[0]
+        self.contact = Contact.objects.create(
+            first_name="Jan",
+            last_name="Cached",
+            phone_number="+48400000000",
+            email="cached@example.com",
+            city="Gdansk",
+            status=self.status
+        )
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_repeated_request_returns_not_modified(self, weather_mock):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get("/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(weather_mock.call_count, 1)
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_write_changes_etag(self, weather_mock):
+        etag = self.client.get("/")["ETag"]
+        self.contact.last_name = "Updated"
+        self.contact.save()
+
+        response = self.client.get("/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "Updated")
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_cached_fragment_skips_contact_queries(self, weather_mock):
+        self.client.get("/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/")
+
+        self.assertContains(response, "Cached")
+        self.assertFalse([query for query in queries if "contacts_contact" in query["sql"]])
+        self.assertEqual(weather_mock.call_count, 1)
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_cached_fragment_gets_visitor_csrf_token(self, weather_mock):
+        self.client.get("/")
+        other_client = self.client_class()
+        content = other_client.get("/").content.decode()
+
+        self.assertNotIn(views.CSRF_TOKEN_PLACEHOLDER, content)
+        self.assertEqual(weather_mock.call_count, 1)
+
+    @patch("contacts.views.peek_weather_for_cities", return_value=({}, []))
+    def test_cached_page_keeps_pagination_context(self, weather_mock):
+        Contact.objects.create(
+            first_name="Anna",
+            last_name="Second",
+            phone_number="+48400000001",
+            email="second@example.com",
+            city="Gdansk",
+            status=self.status
+        )
+        miss = self.client.get("/", {"page_size": 1})
+        hit = self.client.get("/", {"page_size": 1})
+
+        self.assertEqual(weather_mock.call_count, 1)
+        self.assertIsNotNone(miss.context["next_url"])
+        for key in ("next_url", "previous_url"):
+            self.assertEqual(hit.context[key], miss.context[key])
+
+    def test_writes_in_a_transaction_bump_the_version_once_more_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks, transaction.atomic():
+            for index in range(3):
+                self.contact.first_name = f"Jan{index}"
+                self.contact.save()
+        version = get_data_version()
+
+        for callback in callbacks:
+            callback()
+
+        self.assertGreater(get_data_version(), version)
+        bumped = get_data_version()
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_data_version(), bumped)
+
+    def test_api_list_returns_not_modified(self):
+        response = self.client.get("/api/contacts/")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/api/contacts/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        Contact.objects.filter(pk=self.contact.pk).delete()
+        response = self.client.get("/api/contacts/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+
+class ContactCounterTest(APITestCase):
+    def setUp(self):
+        self.new = ContactStatus.objects.get_or_create(name="new")[0]
+        self.lost = ContactStatus.objects.get_or_create(name="lost")[0]
+
+    def _create(self, index, city="Warsaw", status=None):
+        return Contact.objects.create(
+            first_name="Jan",
+            last_name=f"Count{index}",
+            phone_number=f"+4850000000{index}",
+            email=f"count{index}@example.com",
+            city=city,
+            status=status or self.new
+        )
+
+    def _counts(self):
+        return status_counts(), dict(city_counts())
+
+    def test_counters_follow_save_and_delete(self):
+        first = self._create(0)
+        self._create(1, city="Gdansk")
+        self.assertEqual(self._counts(), ({self.new.pk: 2}, {"Warsaw": 1, "Gdansk": 1}))
+
+        contact = Contact.objects.get(pk=first.pk)
+        contact.status = self.lost
+        contact.city = "Gdansk"
+        contact.save()
+        self.assertEqual(self._counts(), ({self.new.pk: 1, self.lost.pk: 1}, {"Gdansk": 2}))
+
+        Contact.objects.filter(pk=first.pk).delete()
+        self.assertEqual(self._counts(), ({self.new.pk: 1}, {"Gdansk": 1}))
+
+    def test_bulk_paths_update_counters(self):
+        self._create(0)
+        ContactImporter().run([
+            {"first_name": "Ola", "last_name": "Import", "phone_number": "+48500000100",
+             "email": "import@example.com", "city": "Poznan", "status": "zagubiony"},
+        ])
+        self.client.post("/api/contacts/bulk/", [
+            {"op": "upsert", "email": "count0@example.com", "city": "Poznan", "status": "lost"},
+        ], format="json")
+
+        self.assertEqual(self._counts(), ({self.lost.pk: 2}, {"Poznan": 2}))
+        self.assertEqual(rebuild_counters(), 2)
+        self.assertEqual(self._counts(), ({self.lost.pk: 2}, {"Poznan": 2}))
+
+        self.client.post("/api/contacts/bulk/", [{"op": "delete", "email": "count0@example.com"}], format="json")
+        self.assertEqual(self._counts(), ({self.lost.pk: 1}, {"Poznan": 1}))
+
+    def test_stats_endpoint_reads_counters(self):
+        self._create(0)
+        self._create(1, status=self.lost)
+        statuses.all_statuses()
+
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/contacts/stats/")
+
+        data = response.json()
+        self.assertEqual(data["total"], 2)
+        self.assertIn({"id": self.lost.pk, "name": "lost", "count": 1}, data["statuses"])
+        self.assertEqual(data["cities"], [{"city": "Warsaw", "count": 2}])
+
+
+class NormalizeStatusesCommandTest(TestCase):
+    def setUp(self):
+        self.nowy = ContactStatus.objects.get_or_create(name="nowy")[0]
+        self.zagubiony = ContactStatus.objects.get_or_create(name="zagubiony")[0]
+        for index in range(5):
+            Contact.objects.create(
+                first_name="Jan",
+                last_name=f"Status{index}",
+                phone_number=f"+4860000000{index}",
+                email=f"status{index}@example.com",
+                city="Warsaw",
+                status=self.nowy if index % 2 == 0 else self.zagubiony
+            )
+
+    def test_dry_run_changes_nothing(self):
+        out = io.StringIO()
+        call_command("normalize_statuses", "--dry-run", stdout=out)
+
+        self.assertIn("'nowy' -> 'new': 3 contact(s)", out.getvalue())
+        self.assertEqual(Contact.objects.filter(status=self.nowy).count(), 3)
+
+    def test_remaps_in_batches_and_deletes_unused_statuses(self):
+        out = io.StringIO()
+        call_command("normalize_statuses", "--batch-size", "2", stdout=out)
+
+        names = Counter(Contact.objects.values_list("status__name", flat=True))
+        self.assertEqual(names, {"new": 3, "lost": 2})
+        self.assertFalse(ContactStatus.objects.filter(name__in=["nowy", "zagubiony"]).exists())
+        self.assertEqual(out.getvalue().count("Remapped"), 3)
+        self.assertIn("Total contacts migrated: 5", out.getvalue())
+        self.assertEqual(status_counts(), {statuses.get_status("new").pk: 3, statuses.get_status("lost").pk: 2})
+
+
+class SeedAndBenchmarkCommandTest(TestCase):
+    def test_seed_contacts_creates_unique_contacts(self):
+        call_command("seed_contacts", "--count", "120", "--batch-size", "50", "--seed", "1", stdout=io.StringIO())
+        call_command("seed_contacts", "--count", "30", stdout=io.StringIO())
+
+        self.assertEqual(Contact.objects.count(), 150)
+        self.assertEqual(Contact.objects.values("email").distinct().count(), 150)
+        self.assertEqual(Contact.objects.values("phone_number").distinct().count(), 150)
+        self.assertEqual(sum(status_counts().values()), 150)
+        self.assertEqual(Contact.objects.filter(search_vector="").count(), 0)
+
+    def test_benchmark_writes_machine_readable_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = f"{directory}/results.json"
+            call_command(
+                "benchmark_contacts", "--sizes", "40", "--repeat", "1", "--import-rows", "5",
+                "--normalize-rows", "5", "--scenarios", "list_last_name,api_list,csv_import,normalize_statuses",
+                "--output", output, "--in-place", "--no-input", stdout=io.StringIO(), stderr=io.StringIO(),
+            )
+            with open(output, encoding="utf-8") as results_file:
+                report = json.load(results_file)
+
+        scenarios = [result["scenario"] for result in report["results"]]
+        self.assertEqual(scenarios, ["list_last_name", "api_list", "csv_import", "normalize_statuses"])
+        self.assertEqual({result["rows"] for result in report["results"]}, {40})
+        self.assertTrue(all(result["queries"] > 0 for result in report["results"]))
+        self.assertEqual(Contact.objects.count(), 40)
+        self.assertFalse(ContactStatus.objects.filter(name="nowy").exists())
+
+    def test_benchmark_leaves_the_configured_database_alone(self):
+        # A separate process, because the benchmark database replaces the default connection.
+        with tempfile.TemporaryDirectory() as directory:
+            database = f"{directory}/db.sqlite3"
+            subprocess.run(
+                [sys.executable, "manage.py", "benchmark_contacts", "--sizes", "0,10", "--repeat", "1",
+                 "--scenarios", "api_list,api_detail", "--output", f"{directory}/results.json"],
+                cwd=settings.BASE_DIR, env={**os.environ, "DATABASE_URL": f"sqlite:///{database}"},
+                capture_output=True, check=True,
+            )
+            with open(f"{directory}/results.json", encoding="utf-8") as results_file:
+                report = json.load(results_file)
+
+            self.assertEqual(os.listdir(directory), ["results.json"])
+        self.assertEqual(
+            [(result["rows"], result["scenario"]) for result in report["results"]],
+            [(0, "api_list"), (10, "api_list"), (10, "api_detail")],
+        )
+
+
+@override_settings(CONTACTS_SERVER_TIMING=True)
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset_metrics()
+        services.reset_circuit_breakers()
+        status = ContactStatus.objects.get_or_create(name="new")[0]
+        Contact.objects.create(
+            first_name="Jan",
+            last_name="Timed",
+            phone_number="+48700100100",
+            email="timed@example.com",
+            city="Warsaw",
+            status=status
+        )
+
+    def test_server_timing_reports_sql_cache_and_render(self):
+        cache.set("weather:warsaw", {"value": {"temperature": 5, "humidity": 60, "windspeed": 4}, "fetched_at": time.time()})
+
+        response = self.client.get("/")
+
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn("render;dur=", timing)
+        self.assertIn('cache-weather;desc="1 hits, 0 misses"', timing)
+        self.assertIn('cache-contact_table;desc="0 hits, 1 misses"', timing)
+
+    def test_upstream_calls_are_timed(self):
+        response = Mock()
+        response.json.return_value = [{"lat": "52.0", "lon": "21.0"}]
+        response.raise_for_status.return_value = None
+        with patch("contacts.http.requests.Session.get", return_value=response):
+            services.get_city_coordinates("Gdansk")
+
+        self.assertIn('contacts_upstream_duration_seconds_count{upstream="nominatim"} 1', metrics.render_metrics())
+
+    def test_metrics_endpoint_serves_histograms(self):
+        self.client.get("/")
+        self.client.get("/api/contacts/")
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        content = response.content.decode()
+        self.assertIn('contacts_request_duration_seconds_count{view="contacts:contact_list"} 1', content)
+        self.assertIn('contacts_request_queries_bucket{view="api_contacts_list_create",le="+Inf"} 1', content)
+        self.assertIn('contacts_render_duration_seconds_count{view="api_contacts_list_create"} 1', content)
+        self.assertIn('contacts_upstream_in_flight{upstream="nominatim"} 0', content)
+
+    def test_metrics_endpoint_is_limited_to_allowed_addresses_and_staff(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.1").status_code, 403)
+
+        self.client.force_login(User.objects.create_user("ops", is_staff=True))
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.1").status_code, 200)
+
+        with override_settings(CONTACTS_METRICS_ENABLED=False):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(CONTACTS_SERVER_TIMING=True)
+    def test_async_middleware_counts_queries_made_in_worker_threads(self):
+        def query():
+            from django.db import connection as thread_connection
+
+            try:
+                with thread_connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            finally:
+                thread_connection.close()
+
+        async def get_response(request):
+            await sync_to_async(query, thread_sensitive=False)()
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(get_response)
+        request = AsyncRequestFactory().get("/")
+        request.resolver_match = None
+
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(request)
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    def test_counters_render_exact_values(self):
+        counter = metrics.CounterMetric("test_total", "Test.", ["kind"])
+        counter.inc(1_234_568, kind="whole")
+        counter.inc(0.25, kind="fraction")
+
+        self.assertEqual(counter.render()[2:], ['test_total{kind="fraction"} 0.25', 'test_total{kind="whole"} 1234568'])
+
+    @override_settings(CONTACTS_QUERY_BUDGET=0)
+    def test_requests_over_budget_are_logged(self):
+        with self.assertLogs("contacts.performance", "WARNING") as logs:
+            self.client.get("/api/contacts/")
+
+        self.assertIn("over budget (queries)", logs.output[0])
+        self.assertIn(
+            'contacts_requests_over_budget_total{view="api_contacts_list_create",budget="queries"} 1',
+            metrics.render_metrics(),
+        )
+
+
+class DatabaseConfigTest(SimpleTestCase):
+    def test_database_from_url(self):
+        sqlite = database_from_url("sqlite:////var/lib/contacts/db.sqlite3", conn_max_age=60)
+        self.assertEqual(sqlite["NAME"], "/var/lib/contacts/db.sqlite3")
+        self.assertEqual(sqlite["OPTIONS"], {"transaction_mode": "IMMEDIATE"})
+        self.assertEqual(sqlite["CONN_MAX_AGE"], 60)
+
+        path = "/srv/contacts #2/100%/db.sqlite3"
+        self.assertEqual(database_from_url(f"sqlite:///{quote(path)}")["NAME"], path)
+
+        postgres = database_from_url(
+            "postgres://contacts:p%40ss@db:5432/contacts?sslmode=require", conn_max_age=60, pool_max_size=10
+        )
+        self.assertEqual(postgres["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual((postgres["USER"], postgres["PASSWORD"], postgres["HOST"]), ("contacts", "p@ss", "db"))
+        self.assertEqual(postgres["OPTIONS"], {"sslmode": "require", "pool": {"min_size": 0, "max_size": 10}})
+        self.assertEqual(postgres["CONN_MAX_AGE"], 0)
+
+        with self.assertRaises(ImproperlyConfigured):
+            database_from_url("mysql://localhost/contacts")
+
+    def test_parallel_writers_and_readers_on_sqlite_file(self):
+        writers, readers, transactions_per_writer, rows_per_transaction = 4, 4, 25, 5
+        errors = []
+        writers_done = threading.Event()
+
+        with tempfile.TemporaryDirectory() as directory:
+            config = connections.configure_settings(
+                {"default": database_from_url(f"sqlite:///{directory}/concurrency.sqlite3")}
+            )["default"]
+
+            def open_connection():
+                wrapper = DatabaseWrapper(config, alias="concurrency")
+                connections["concurrency"] = wrapper
+                return wrapper
+
+            setup = open_connection()
+            with setup.cursor() as cursor:
+                cursor.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, writer INTEGER)")
+                cursor.execute("PRAGMA journal_mode")
+                journal_mode = cursor.fetchone()[0]
+            setup.close()
+
+            def write(writer):
+                wrapper = open_connection()
+                try:
+                    for _ in range(transactions_per_writer):
+                        # Read before writing, the pattern that fails with "database is locked" in deferred mode.
+                        with transaction.atomic(using="concurrency"), wrapper.cursor() as cursor:
+                            cursor.execute("SELECT COUNT(*) FROM item")
+                            for _ in range(rows_per_transaction):
+                                cursor.execute("INSERT INTO item (writer) VALUES (%s)", [writer])
+                except Exception as exc:
+                    errors.append(exc)
+                finally:
+                    wrapper.close()
+
+            def read():
+                wrapper = open_connection()
+                last_count = 0
+                try:
+                    while not writers_done.is_set():
+                        with wrapper.cursor() as cursor:
+                            cursor.execute("SELECT COUNT(*) FROM item")
+                            count = cursor.fetchone()[0]
+                        if count < last_count or count % rows_per_transaction:
+                            errors.append(AssertionError(f"Saw {count} rows after {last_count}"))
+                        last_count = count
+                except Exception as exc:
+                    errors.append(exc)
+                finally:
+                    wrapper.close()
+
+            reader_threads = [threading.Thread(target=read) for _ in range(readers)]
+            writer_threads = [threading.Thread(target=write, args=(index,)) for index in range(writers)]
+            for thread in reader_threads + writer_threads:
+                thread.start()
+            for thread in writer_threads:
+                thread.join()
+            writers_done.set()
+            for thread in reader_threads:
+                thread.join()
+
+            check = open_connection()
+            with check.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM item")
+                total = cursor.fetchone()[0]
+            check.close()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(total, writers * transactions_per_writer * rows_per_transaction)
@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = "contacts"
 
 urlpatterns = [
-    path("", views.contact_list, name="contact_list"),
+    path(
+        "",
+        views.contact_list_async if settings.CONTACTS_ASYNC_VIEWS else views.contact_list,
+        name="contact_list",
+    ),
     path("create/", views.contact_create, name="contact_create"),
     path("<int:contact_id>/edit/", views.contact_update, name="contact_update"),
     path("<int:contact_id>/delete/", views.contact_delete, name="contact_delete"),
+    path("export/", views.export_contacts_view, name="export_contacts"),
     path("import/", views.import_contacts, name="import_contacts"),
+    path("import/<int:job_id>/", views.import_job_detail, name="import_job_detail"),
+    path("metrics", views.metrics, name="metrics"),
 ]
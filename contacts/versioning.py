@@ -0,0 +1,51 @@
+import datetime
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+DATA_VERSION_KEY = "contacts:data_version"
+
+_commits = threading.local()
+
+
+def _version_cache():
+    # The version must be the same in every worker the moment it is bumped, so it skips the
+    # per-process tier of TwoTierCache and goes straight to the shared cache.
+    return getattr(cache, "shared", cache)
+
+
+def _store_new_version():
+    # Versions are nanosecond timestamps, so a version lost from the cache is never reused.
+    _version_cache().set(DATA_VERSION_KEY, time.time_ns(), None)
+
+
+def _store_new_version_after_commit(scheduled_at):
+    # Every bump in a transaction schedules one of these and they all run right after the commit,
+    # so the first one is enough; later transactions schedule theirs after it ran.
+    if getattr(_commits, "bumped_at", 0) > scheduled_at:
+        return
+    _store_new_version()
+    _commits.bumped_at = time.monotonic_ns()
+
+
+def get_data_version():
+    version_cache = _version_cache()
+    version = version_cache.get(DATA_VERSION_KEY)
+    if version is None:
+        version_cache.add(DATA_VERSION_KEY, time.time_ns(), None)
+        version = version_cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def bump_data_version(using=None):
+    _store_new_version()
+    # Pages rendered before the commit saw the old rows, so bump once more when it lands.
+    if transaction.get_connection(using).in_atomic_block:
+        scheduled_at = time.monotonic_ns()
+        transaction.on_commit(lambda: _store_new_version_after_commit(scheduled_at), using=using)
+
+
+def data_version_modified_at(version):
+    return datetime.datetime.fromtimestamp(version / 1e9, tz=datetime.timezone.utc)
@@ -1,56 +1,206 @@
-import csv
-import io
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
-from django.db import IntegrityError
-from django.db.models import Q
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
 from django.views.decorators.http import require_http_methods
 
+from .exporters import EXPORT_FORMATS, export_contacts
 from .forms import ContactForm, CsvImportForm
-from .models import Contact, ContactStatus
-from .services import get_current_weather_for_city
+from .http import upstream_clients
+from .jobs import enqueue_import_job
+from .metrics import measure_render, record_cache_lookup, render_metrics
+from .models import Contact, ImportJob
+from .pagination import SORT_ORDERS, apaginate_keyset, paginate_keyset
+from .search import fts_available, search_contacts
+from .services import apeek_weather_for_cities, peek_weather_for_cities
+from .statuses import STATUS_NAME_MAPPING
+from .versioning import data_version_modified_at, get_data_version
 
-STATUS_NAME_MAPPING = {
-    "nowy": "new",
-    "zagubiony": "lost",
-    "w trakcie": "in progress",
-    "nieaktualny": "outdated",
-}
+CSRF_TOKEN_PLACEHOLDER = "__contacts_csrf_token__"
 
 
-def contact_list(request):
+def _get_page_size(request):
+    default_page_size = settings.CONTACTS_PAGE_SIZE
+    try:
+        page_size = int(request.GET.get("page_size") or default_page_size)
+    except ValueError:
+        page_size = default_page_size
+    return max(1, min(page_size, settings.CONTACTS_MAX_PAGE_SIZE))
+
+
+def _contact_list_params(request):
     search_query = (request.GET.get("q") or "").strip()
     sort_key = (request.GET.get("sort") or "last_name").strip()
+    if sort_key not in SORT_ORDERS:
+        sort_key = "last_name"
+    return search_query, sort_key, _get_page_size(request), request.GET.get("cursor") or ""
 
-    contacts_qs = Contact.objects.select_related("status").all()
 
+def _contact_list_query(search_query):
+    contacts_qs = Contact.objects.select_related("status", "location").defer("search_vector")
     if search_query:
-        contacts_qs = contacts_qs.filter(
-            Q(first_name__icontains=search_query)
-            | Q(last_name__icontains=search_query)
-            | Q(email__icontains=search_query)
-            | Q(phone_number__icontains=search_query)
-            | Q(city__icontains=search_query)
-        )
-
-    if sort_key == "created_at":
-        contacts_qs = contacts_qs.order_by("-created_at")
-    else:
-        contacts_qs = contacts_qs.order_by("last_name", "first_name")
+        contacts_qs = search_contacts(contacts_qs, search_query)
+    return contacts_qs
+
+
+def _weather_lookup(page):
+    city_names = list({c.city.strip() for c in page if c.city and c.city.strip()})
+    known_coordinates = {c.city: c.location.coordinates for c in page if c.location}
+    return city_names, known_coordinates
+
+
+def _contact_list_context(page, search_query, sort_key, page_size, weather_by_city, weather_pending):
+    base_params = {"q": search_query, "sort": sort_key}
+    if page_size != settings.CONTACTS_PAGE_SIZE:
+        base_params["page_size"] = page_size
+    next_url = previous_url = None
+    if page.has_next:
+        next_url = "?" + urlencode({**base_params, "cursor": page.next_cursor})
+    if page.has_previous:
+        previous_url = "?" + urlencode({**base_params, "cursor": page.previous_cursor})
+
+    return {
+        "contacts": page,
+        "next_url": next_url,
+        "previous_url": previous_url,
+        "weather_by_city": weather_by_city,
+        "weather_pending": set(weather_pending),
+    }
+
+
+def _page_cache_window():
+    # Cached pages also carry weather, so they roll over every CONTACTS_PAGE_CACHE_TIMEOUT seconds.
+    timeout = settings.CONTACTS_PAGE_CACHE_TIMEOUT
+    return int(time.time() // timeout) * timeout
+
+
+def _fragment_cache_key(version, params):
+    digest = hashlib.sha256(json.dumps(params).encode("utf-8")).hexdigest()
+    return f"contact_page:{version}:{_page_cache_window()}:{digest}"
+
+
+def _cached_table(table_context):
+    # Pagination links are cached with the fragment, so a cache hit has the same page context as a miss.
+    return {
+        "html": _render_contact_table(table_context),
+        "next_url": table_context["next_url"],
+        "previous_url": table_context["previous_url"],
+    }
+
+
+def _contact_list_validators(request, version):
+    # Flash messages are part of the page, so never answer 304 while one is waiting.
+    if len(messages.get_messages(request)):
+        return None, None
+    get_token(request)
+    csrf_secret = request.META.get("CSRF_COOKIE", "")
+    payload = f"{version}:{_page_cache_window()}:{request.get_full_path()}:{csrf_secret}"
+    etag = quote_etag(hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32])
+    last_modified = max(int(data_version_modified_at(version).timestamp()), _page_cache_window())
+    return etag, last_modified
+
+
+def _render_contact_table(context):
+    # The cached fragment is shared by all visitors, so it holds a placeholder instead of a CSRF token.
+    with measure_render():
+        return render_to_string("contacts/_contact_table.html", {**context, "csrf_token": CSRF_TOKEN_PLACEHOLDER})
+
 
-    city_names = list({c.city.strip() for c in contacts_qs if c.city and c.city.strip()})
-    weather_by_city = {}
-    for city in city_names:
-        weather_by_city[city] = get_current_weather_for_city(city)
+def _render_contact_list(request, context):
+    with measure_render():
+        return render(request, "contacts/contact_list.html", context)
 
-    context = {
-        "contacts": contacts_qs,
+
+def _contact_list_page_context(request, params, cached_table, table_context):
+    search_query, sort_key, page_size, _ = params
+    return {
+        **table_context,
+        "next_url": cached_table["next_url"],
+        "previous_url": cached_table["previous_url"],
         "search_query": search_query,
         "sort_key": sort_key,
-        "weather_by_city": weather_by_city,
+        "page_size": page_size,
+        "default_page_size": settings.CONTACTS_PAGE_SIZE,
+        "contact_table": mark_safe(cached_table["html"].replace(CSRF_TOKEN_PLACEHOLDER, get_token(request))),
     }
-    return render(request, "contacts/contact_list.html", context)
+
+
+def _set_validators(response, etag, last_modified):
+    if etag:
+        response.headers.setdefault("ETag", etag)
+    if last_modified:
+        response.headers.setdefault("Last-Modified", http_date(last_modified))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def contact_list(request):
+    params = _contact_list_params(request)
+    search_query, sort_key, page_size, cursor = params
+    version = get_data_version()
+    etag, last_modified = _contact_list_validators(request, version)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _set_validators(not_modified, etag, last_modified)
+
+    fragment_key = _fragment_cache_key(version, params)
+    cached_table = cache.get(fragment_key)
+    record_cache_lookup("contact_table", int(cached_table is not None), int(cached_table is None))
+    table_context = {}
+    if cached_table is None:
+        page = paginate_keyset(_contact_list_query(search_query), sort_key, cursor, page_size)
+        city_names, known_coordinates = _weather_lookup(page)
+        weather_by_city, weather_pending = peek_weather_for_cities(city_names, coordinates=known_coordinates)
+        table_context = _contact_list_context(page, search_query, sort_key, page_size, weather_by_city, weather_pending)
+        cached_table = _cached_table(table_context)
+        cache.set(fragment_key, cached_table, settings.CONTACTS_PAGE_CACHE_TIMEOUT)
+
+    context = _contact_list_page_context(request, params, cached_table, table_context)
+    return _set_validators(_render_contact_list(request, context), etag, last_modified)
+
+
+async def contact_list_async(request):
+    params = _contact_list_params(request)
+    search_query, sort_key, page_size, cursor = params
+    version = await sync_to_async(get_data_version)()
+    # Reading flash messages loads the session, which has no async API.
+    etag, last_modified = await sync_to_async(_contact_list_validators)(request, version)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _set_validators(not_modified, etag, last_modified)
+
+    fragment_key = _fragment_cache_key(version, params)
+    cached_table = await cache.aget(fragment_key)
+    record_cache_lookup("contact_table", int(cached_table is not None), int(cached_table is None))
+    table_context = {}
+    if cached_table is None:
+        # Checking for the FTS table is a one-off introspection query that has no async API.
+        await sync_to_async(fts_available)()
+        page = await apaginate_keyset(_contact_list_query(search_query), sort_key, cursor, page_size)
+        city_names, known_coordinates = _weather_lookup(page)
+        weather_by_city, weather_pending = await apeek_weather_for_cities(city_names, coordinates=known_coordinates)
+        table_context = _contact_list_context(page, search_query, sort_key, page_size, weather_by_city, weather_pending)
+        cached_table = _cached_table(table_context)
+        await cache.aset(fragment_key, cached_table, settings.CONTACTS_PAGE_CACHE_TIMEOUT)
+
+    context = _contact_list_page_context(request, params, cached_table, table_context)
+    # Rendering may touch the session and messages, which are still synchronous.
+    response = await sync_to_async(_render_contact_list)(request, context)
+    return _set_validators(response, etag, last_modified)
 
 
 @require_http_methods(["GET", "POST"])
@@ -94,53 +244,41 @@ def import_contacts(request):
         form = CsvImportForm(request.POST, request.FILES)
         if form.is_valid():
             uploaded_file = form.cleaned_data["file"]
-            try:
-                decoded_text = uploaded_file.read().decode("utf-8")
-            except UnicodeDecodeError:
-                decoded_text = uploaded_file.read().decode("utf-8-sig")
-
-            reader = csv.DictReader(io.StringIO(decoded_text))
-            created_count = 0
-            skipped_count = 0
-
-            default_status = ContactStatus.objects.first()
-            if not default_status:
-                default_status = ContactStatus.objects.create(name="new")
-
-            for row in reader:
-                first_name = (row.get("first_name") or "").strip()
-                last_name = (row.get("last_name") or "").strip()
-                phone_number = (row.get("phone_number") or "").strip()
-                email = (row.get("email") or "").strip()
-                city = (row.get("city") or "").strip()
-                status_name = (row.get("status") or "").strip()
-
-                if not (first_name and last_name and phone_number and email and city):
-                    skipped_count += 1
-                    continue
-
-                status = default_status
-                if status_name:
-                    normalized_status_name = STATUS_NAME_MAPPING.get(status_name.lower(), status_name)
-                    status, _ = ContactStatus.objects.get_or_create(name=normalized_status_name)
-
-                try:
-                    Contact.objects.create(
-                        first_name=first_name,
-                        last_name=last_name,
-                        phone_number=phone_number,
-                        email=email,
-                        city=city,
-                        status=status,
-                    )
-                    created_count += 1
-                except IntegrityError:
-                    skipped_count += 1
-
-            messages.success(request, f"Import finished. Created: {created_count}, Skipped: {skipped_count}.")
-            return redirect("contacts:contact_list")
+            job = ImportJob.objects.create(file=uploaded_file, original_name=uploaded_file.name)
+            enqueue_import_job(job)
+            return redirect("contacts:import_job_detail", job_id=job.id)
     else:
         form = CsvImportForm()
 
     return render(request, "contacts/import_contacts.html", {"form": form})
 
+
+@require_http_methods(["GET"])
+def export_contacts_view(request):
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        export_format = "csv"
+
+    contacts_qs = Contact.objects.all()
+    search_query = (request.GET.get("q") or "").strip()
+    if search_query:
+        contacts_qs = search_contacts(contacts_qs, search_query)
+
+    response = StreamingHttpResponse(
+        export_contacts(export_format, contacts_qs), content_type=EXPORT_FORMATS[export_format]
+    )
+    response["Content-Disposition"] = f'attachment; filename="contacts.{export_format}"'
+    return response
+
+
+def import_job_detail(request, job_id: int):
+    job = get_object_or_404(ImportJob, id=job_id)
+    return render(request, "contacts/import_job.html", {"job": job})
+
+
+def metrics(request):
+    if not settings.CONTACTS_METRICS_ENABLED:
+        raise Http404
+    if not request.user.is_staff and request.META.get("REMOTE_ADDR") not in settings.CONTACTS_METRICS_ALLOWED_IPS:
+        raise PermissionDenied
+    return HttpResponse(render_metrics(upstream_clients()), content_type="text/plain; version=0.0.4; charset=utf-8")
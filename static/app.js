@@ -57,3 +57,100 @@
     }
   }, true);
 })();
+
+(function () {
+  const container = document.querySelector("[data-import-job-url]");
+  if (!container || container.dataset.importJobFinished === "true") return;
+
+  function setField(name, value) {
+    const element = container.querySelector('[data-import-field="' + name + '"]');
+    if (element) element.textContent = value === null || value === undefined ? "-" : value;
+  }
+
+  function render(job) {
+    ["status", "rows_processed", "created_count", "skipped_count", "throughput"].forEach(function (name) {
+      setField(name, job[name]);
+    });
+
+    const errorMessage = container.querySelector('[data-import-field="error_message"]');
+    errorMessage.textContent = job.error_message;
+    errorMessage.classList.toggle("d-none", !job.error_message);
+
+    const errorList = container.querySelector("[data-import-errors]");
+    errorList.replaceChildren.apply(errorList, job.errors.map(function (error) {
+      const item = document.createElement("li");
+      item.textContent = "Row " + error.row + " skipped: " + error.reason + ".";
+      return item;
+    }));
+  }
+
+  function poll() {
+    fetch(container.dataset.importJobUrl, { headers: { Accept: "application/json" } })
+      .then(function (response) { return response.json(); })
+      .then(function (job) {
+        render(job);
+        if (!job.is_finished) setTimeout(poll, 1000);
+      })
+      .catch(function () { setTimeout(poll, 5000); });
+  }
+
+  poll();
+})();
+
+(function () {
+  const table = document.querySelector("[data-weather-url]");
+  if (!table) return;
+
+  const maxAttempts = 3;
+
+  function pendingCells(city) {
+    return Array.from(table.querySelectorAll("td[data-weather-city]")).filter(function (cell) {
+      return city === undefined || cell.dataset.weatherCity === city;
+    });
+  }
+
+  function renderWeather(cell, weather) {
+    cell.removeAttribute("data-weather-city");
+    if (!weather) {
+      const empty = document.createElement("span");
+      empty.className = "text-muted small";
+      empty.textContent = "No data";
+      cell.replaceChildren(empty);
+      return;
+    }
+    const wrapper = document.createElement("div");
+    wrapper.className = "small";
+    [
+      "Temp: " + weather.temperature + "°C",
+      "Humidity: " + weather.humidity + "%",
+      "Wind: " + weather.windspeed + " km/h",
+    ].forEach(function (text) {
+      const line = document.createElement("div");
+      line.textContent = text;
+      wrapper.appendChild(line);
+    });
+    cell.replaceChildren(wrapper);
+  }
+
+  function load(cities, attempt) {
+    // Sorted city lists give stable URLs, so browser and proxy caches can reuse responses.
+    const query = new URLSearchParams(cities.slice().sort().map(function (city) { return ["city", city]; }));
+    fetch(table.dataset.weatherUrl + "?" + query, { headers: { Accept: "application/json" } })
+      .then(function (response) { return response.json(); })
+      .then(function (data) {
+        Object.keys(data.results).forEach(function (city) {
+          if (data.pending.indexOf(city) !== -1 && attempt < maxAttempts) return;
+          pendingCells(city).forEach(function (cell) { renderWeather(cell, data.results[city]); });
+        });
+        if (data.pending.length && attempt < maxAttempts) {
+          setTimeout(function () { load(data.pending, attempt + 1); }, 2000);
+        }
+      })
+      .catch(function () {
+        pendingCells().forEach(function (cell) { renderWeather(cell, null); });
+      });
+  }
+
+  const cities = Array.from(new Set(pendingCells().map(function (cell) { return cell.dataset.weatherCity; })));
+  if (cities.length) load(cities, 1);
+})();